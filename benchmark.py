@@ -0,0 +1,100 @@
+import os
+import random
+import time
+
+from instance import INPUT_NAMES, Instance, find_inputs, load_instance
+from engines import extract_groups
+
+# Benchmark harness: times every engine on a set of instances.
+#   Generated instances have a planted solution (every planted group shares the
+#   TA slot it was planted in), so they are always satisfiable.
+
+DAYS = ["Mon", "Tues", "Weds", "Thurs", "Fri"]
+
+
+def random_instance(n_students, group_max, seed=0, slack=1.5, avail_per_student=8, partner_rate=0.3) -> Instance:
+    rng = random.Random(seed)
+    n_groups = -(-n_students // group_max)
+    n_tas = max(1, n_groups // 6)
+    n_slots = max(n_groups, int(n_groups * slack))
+
+    # TAs take turns, and each TA's slots walk through the week, so names stay
+    #   unique up to 60 slots per TA
+    ta_time_slots = [
+        f"{DAYS[(i // n_tas) % len(DAYS)]} {(i // n_tas // len(DAYS)) % 12 + 1}:00pm ({'ta' + str(i % n_tas)})"
+        for i in range(n_slots)
+    ]
+    students = [f"student{i}" for i in range(n_students)]
+    rng.shuffle(students)
+
+    student_availability = {}
+    student_to_partners = {}
+    planted_slots = rng.sample(ta_time_slots, n_groups)
+    for gi, slot in enumerate(planted_slots):
+        members = students[gi * group_max : (gi + 1) * group_max]
+        for s in members:
+            extra = rng.sample(ta_time_slots, min(avail_per_student, len(ta_time_slots)))
+            student_availability[s] = set(extra) | {slot}
+        if len(members) > 1 and rng.random() < partner_rate:
+            a, b = members[0], members[1]
+            student_to_partners.setdefault(a, set()).add(b)
+            student_to_partners.setdefault(b, set()).add(a)
+
+    return Instance(student_availability, student_to_partners, ta_time_slots, group_max)
+
+
+# Loads every directory under `directory` (and `directory` itself) that holds
+#   the five input CSVs, as (name, Instance) pairs.
+def load_directory(directory, group_max) -> list:
+    instances = []
+    for root, _, files in sorted(os.walk(directory)):
+        paths = find_inputs(root, files)
+        if len(paths) < len(INPUT_NAMES):
+            continue
+        try:
+            instances.append((root, load_instance(group_max=group_max, **paths)))
+        except Exception as e:
+            print(f"WARNING: Skipping {root}: {e}")
+    return instances
+
+
+# Runs each engine on each (name, instance) pair and prints a table of times.
+# Returns {(instance name, engine label_for the instance): seconds or None if
+#   unsolved}.
+def run(instances, engines, timeout=None) -> dict:
+    results = {}
+    cells = {}
+    for instance_name, instance in instances:
+        for i, engine in enumerate(engines):
+            start = time.perf_counter()
+            try:
+                assigned = engine.solve(instance, timeout)
+                if assigned is not None:
+                    extract_groups(instance, assigned)  # validates the assignment
+            except Exception as e:
+                print(f"ERROR: {engine.label} failed on {instance_name}: {e!r}")
+                assigned = None
+            elapsed = time.perf_counter() - start if assigned is not None else None
+            # recorded under the configuration that ran, e.g. the tactic chain "auto" resolved to
+            results[(instance_name, engine.label_for(instance))] = elapsed
+            cells[(instance_name, i)] = elapsed
+
+    width = max(len(name) for name, _ in instances)
+    print(f"{'instance':<{width}}  " + "  ".join(f"{e.label:>16}" for e in engines))
+    for instance_name, _ in instances:
+        row = []
+        for i in range(len(engines)):
+            elapsed = cells[(instance_name, i)]
+            row.append(f"{'-' if elapsed is None else f'{elapsed:.2f}s':>16}")
+        print(f"{instance_name:<{width}}  " + "  ".join(row))
+    return results
+
+
+# The label that solved the most instances, breaking ties by total time.
+def fastest(results, labels):
+    def score(label):
+        times = [t for (_, l), t in results.items() if l == label]
+        solved = [t for t in times if t is not None]
+        return (-len(solved), sum(solved))
+
+    return min(labels, key=score)
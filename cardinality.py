@@ -0,0 +1,133 @@
+from z3 import *
+
+# Cardinality encodings for group capacity constraints.
+#
+# "pb" hands the constraint to Z3's pseudo-boolean engine as-is (PbLe/PbEq).
+#   The others build a unary count of the literals out of plain boolean
+#   auxiliaries, which Z3 (or a SAT solver) then handles by propagation:
+#     seqcounter - Sinz's sequential counter, O(n * k) auxiliaries
+#     totalizer  - Bailleux & Boufkhad's totalizer, O(n log n * k) auxiliaries
+#     sortnet    - Batcher's odd-even merge sorting network, O(n log^2 n)
+#   In every case outputs[j] is true IFF at least j + 1 literals are true, for
+#   j < bound, so both the "0 or k" and the "one of a size set" shapes can be
+#   read off the same count.
+ENCODINGS = ["pb", "seqcounter", "totalizer", "sortnet"]
+
+
+class Counter:
+    # Counts how many of `lits` are true, up to `bound` (which must be larger
+    #   than any k passed to at_most/equals). Auxiliary variables are named after
+    #   `name`; the constraints defining them are in self.constraints.
+    def __init__(self, lits, bound, encoding, name):
+        if encoding not in ENCODINGS:
+            raise Exception(f"ERROR: Unknown cardinality encoding {encoding} (expected one of {ENCODINGS})")
+        self.lits = list(lits)
+        self.encoding = encoding
+        self.constraints = []
+        self.outputs = []
+        self._n_aux = 0
+        self._name = name
+
+        bound = min(bound, len(self.lits))
+        if encoding == "seqcounter":
+            self.outputs = self._seqcounter(bound)
+        elif encoding == "totalizer":
+            self.outputs = self._totalizer(self.lits, bound)
+        elif encoding == "sortnet":
+            self.outputs = self._sortnet(bound)
+
+    def _aux(self, definition):
+        self._n_aux += 1
+        x = Bool(f"{self._name}_aux_{self._n_aux}")
+        self.constraints.append(x == definition)
+        return x
+
+    def _seqcounter(self, bound):
+        # row[j] is true IFF at least j + 1 of the literals seen so far are true
+        row = []
+        for x in self.lits:
+            new_row = []
+            for j in range(min(bound, len(row) + 1)):
+                at_least_j = row[j - 1] if j > 0 else True
+                carried = row[j] if j < len(row) else False
+                new_row.append(self._aux(Or(carried, And(x, at_least_j))))
+            row = new_row
+        return row
+
+    def _totalizer(self, lits, bound):
+        if len(lits) <= 1:
+            return list(lits[:bound])
+        left = self._totalizer(lits[: len(lits) // 2], bound)
+        right = self._totalizer(lits[len(lits) // 2 :], bound)
+        outputs = []
+        for k in range(min(bound, len(left) + len(right))):
+            # at least k + 1 in total IFF at least i on the left and k + 1 - i on the right
+            terms = []
+            for i in range(k + 2):
+                j = k + 1 - i
+                if i > len(left) or j > len(right):
+                    continue
+                terms.append(
+                    And(left[i - 1] if i > 0 else True, right[j - 1] if j > 0 else True)
+                )
+            outputs.append(self._aux(Or(terms)))
+        return outputs
+
+    def _sortnet(self, bound):
+        size = 1
+        while size < len(self.lits):
+            size *= 2
+        wires = self.lits + [BoolVal(False)] * (size - len(self.lits))
+
+        # comparator: the larger value goes to the lower index (descending order)
+        def compare(i, j):
+            wires[i], wires[j] = self._aux(Or(wires[i], wires[j])), self._aux(
+                And(wires[i], wires[j])
+            )
+
+        # hi is inclusive, as in the textbook formulation
+        def merge(lo, hi, step):
+            double = step * 2
+            if double < hi - lo:
+                merge(lo, hi, double)
+                merge(lo + step, hi, double)
+                for i in range(lo + step, hi - step, double):
+                    compare(i, i + step)
+            else:
+                compare(lo, lo + step)
+
+        def sort(lo, hi):
+            if hi - lo >= 1:
+                mid = lo + (hi - lo) // 2
+                sort(lo, mid)
+                sort(mid + 1, hi)
+                merge(lo, hi, 1)
+
+        sort(0, size - 1)
+        return wires[:bound]
+
+    # The number of true literals is at most k.
+    def at_most(self, k):
+        if not self.lits:
+            return BoolVal(True)
+        if self.encoding == "pb":
+            return PbLe([(x, 1) for x in self.lits], k)
+        if k >= len(self.lits):
+            return BoolVal(True)
+        return Not(self.outputs[k])
+
+    # The number of true literals is exactly k.
+    def equals(self, k):
+        if not self.lits:
+            return BoolVal(k == 0)
+        if self.encoding == "pb":
+            return PbEq([(x, 1) for x in self.lits], k)
+        if k > len(self.lits):
+            return BoolVal(False)
+        at_least_k = self.outputs[k - 1] if k > 0 else BoolVal(True)
+        more_than_k = self.outputs[k] if k < len(self.lits) else BoolVal(False)
+        return And(at_least_k, Not(more_than_k))
+
+    # The number of true literals is one of `sizes`.
+    def in_sizes(self, sizes):
+        return Or([self.equals(k) for k in sorted(sizes)])
@@ -0,0 +1,211 @@
+import itertools
+import multiprocessing
+import queue
+import sys
+import time
+from collections import defaultdict
+from multiprocessing.managers import BaseManager
+
+from decompose import partner_units
+
+# Cube-and-conquer for instances the solver can't crack in one piece.
+#
+# The search is split up front on the slot choices of the most constrained
+#   students and partner groups: every combination of their options is a
+#   "cube", solved under assumptions on a warm solver. Since every solution
+#   picks one option per branching group, one SAT cube is a solution and all
+#   cubes UNSAT proves the instance infeasible.
+#
+# Cubes are handed out through a work queue served by a multiprocessing
+#   manager, so workers on other hosts can join a run the same way the local
+#   ones do:
+#       python3 cubes.py <host:port> <authkey>
+
+
+# Ranks partner units by lookahead on the availability data: fewest options
+#   first, then the most contested options (demand over capacity).
+# Returns [(representative login, size, [slots])].
+def branching_units(instance):
+    units = partner_units(instance.student_availability, instance.student_to_partners)
+    demand = defaultdict(int)
+    for members, common in units:
+        for slot in common:
+            demand[slot] += len(members)
+
+    ranked = []
+    for members, common in units:
+        options = [slot for slot in common if instance.slot_capacity[slot] >= len(members)]
+        pressure = sum(demand[slot] / instance.slot_capacity[slot] for slot in options)
+        # least contested options first, so likely-SAT cubes are tried early
+        options.sort(key=lambda slot: demand[slot] / instance.slot_capacity[slot])
+        ranked.append(
+            (len(options), -pressure / max(1, len(options)), members[0], len(members), options)
+        )
+    ranked.sort()
+    return [(login, size, options) for _, _, login, size, options in ranked]
+
+
+# Builds at most n_cubes cubes, each a list of (login, TA slot) assumptions.
+#   Units whose options would take the product past n_cubes are passed over
+#   for later ones with fewer options. Combinations that overfill a slot are
+#   dropped; they have no solutions.
+def make_cubes(instance, n_cubes):
+    chosen = []
+    product = 1
+    for login, size, options in branching_units(instance):
+        if product * 2 > n_cubes:
+            break
+        if len(options) <= 1 or product * len(options) > n_cubes:
+            continue
+        chosen.append((login, size, options))
+        product *= len(options)
+
+    cubes = []
+    pruned = 0
+    for combination in itertools.product(*(options for _, _, options in chosen)):
+        load = defaultdict(int)
+        for (_, size, _), slot in zip(chosen, combination):
+            load[slot] += size
+        if any(load[slot] > instance.slot_capacity[slot] for slot in load):
+            pruned += 1
+            continue
+        cubes.append([(login, slot) for (login, _, _), slot in zip(chosen, combination)])
+
+    print(
+        f"Cube-and-conquer: branching on {len(chosen)} students or partner groups, "
+        f"{len(cubes)} cubes ({pruned} pruned by lookahead)."
+    )
+    return cubes
+
+
+class CubeManager(BaseManager):
+    pass
+
+
+# These live in the manager's server process; everyone else uses proxies. The
+#   server may be spawned rather than forked (the default on macOS and
+#   Windows), so it gets the job through _set_job() instead of inheriting it,
+#   and the registered callables are module-level functions that pickle.
+_tasks = queue.Queue()
+_results = queue.Queue()
+_job = {}
+
+
+def _set_job(job):
+    _job["job"] = job
+
+
+def _get_tasks():
+    return _tasks
+
+
+def _get_results():
+    return _results
+
+
+def _get_job():
+    return _job
+
+
+CubeManager.register("get_tasks", callable=_get_tasks)
+CubeManager.register("get_results", callable=_get_results)
+CubeManager.register("get_job", callable=_get_job)
+
+
+# Pulls cubes off the queue and solves them on one warm solver until the queue
+#   hands out None or the server goes away.
+def work(address, authkey):
+    manager = CubeManager(address=address, authkey=authkey)
+    manager.connect()
+    tasks, results = manager.get_tasks(), manager.get_results()
+    instance, engine, timeout = manager.get_job()._getvalue()["job"]
+
+    state = engine.start(instance)
+    try:
+        while True:
+            item = tasks.get()
+            if item is None:
+                break
+            cube_id, cube = item
+            assumptions = [
+                (instance.student_to_id[login], instance.slot_to_id[slot])
+                for login, slot in cube
+            ]
+            assigned = engine.check(state, timeout, assumptions)
+            results.put((cube_id, state.result, assigned))
+    except (EOFError, ConnectionError):
+        pass
+    finally:
+        engine.stop(state)
+
+
+# Solves the instance cube by cube with n_workers local workers. Workers on other
+#   hosts can join through `address` while the run lasts.
+# Returns the assigned pairs of the first SAT cube, or None.
+def solve(instance, engine, n_cubes, n_workers, address, authkey, timeout=None):
+    cubes = make_cubes(instance, n_cubes)
+    if not cubes:
+        print("unsat (every cube was pruned)")
+        return None
+
+    manager = CubeManager(address=address, authkey=authkey)
+    manager.start(initializer=_set_job, initargs=((instance, engine, timeout),))
+    host, port = manager.address
+    print(f"Cube-and-conquer: serving cubes on {host}:{port}. More workers can join with")
+    print(f"  python3 cubes.py {host}:{port} {authkey.decode()}")
+
+    tasks, results = manager.get_tasks(), manager.get_results()
+    for cube_id, cube in enumerate(cubes):
+        tasks.put((cube_id, cube))
+    for _ in range(n_workers):
+        tasks.put(None)
+
+    workers = [
+        multiprocessing.Process(target=work, args=(manager.address, authkey))
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    outcome = defaultdict(int)
+    assigned = None
+    try:
+        while sum(outcome.values()) < len(cubes):
+            if deadline is not None and time.monotonic() > deadline:
+                print("WARNING: Time budget exhausted before every cube was solved.")
+                break
+            try:
+                cube_id, result, cube_assigned = results.get(timeout=1)
+            except queue.Empty:
+                # with no local workers, wait for remote ones instead
+                if workers and not any(worker.is_alive() for worker in workers):
+                    print("WARNING: Every local worker exited before every cube was solved.")
+                    break
+                continue
+            outcome[result] += 1
+            if result == "sat":
+                print(f"Cube-and-conquer: cube {cube_id} is SAT.")
+                assigned = cube_assigned
+                break
+    finally:
+        for worker in workers:
+            worker.terminate()
+        manager.shutdown()
+
+    if assigned is None:
+        print(
+            f"Cube-and-conquer: {outcome['unsat']} of {len(cubes)} cubes UNSAT, "
+            f"{outcome['unknown']} unknown."
+        )
+        if outcome["unsat"] == len(cubes):
+            print("unsat (every cube is UNSAT)")
+    return assigned
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: cubes.py <host:port> <authkey>")
+        sys.exit(1)
+    host, port = sys.argv[1].rsplit(":", 1)
+    work((host, int(port)), sys.argv[2].encode())
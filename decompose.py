@@ -0,0 +1,229 @@
+import random
+from collections import defaultdict
+
+# Group-then-schedule decomposition (see "Challenge 1" in groups.py).
+#   Stage one forms groups by seating every student in some TA slot they can
+#   attend, and grouping the students who share a slot, so every group has at
+#   least one slot in common. Stage two matches the formed groups to concrete
+#   "{slot} ({ta})" TA slots with bipartite matching (possibly moving a group
+#   to another slot its members share).
+#
+# Blocklists are already folded into each student's expanded availability, so
+#   any slot in a group's common availability is one the TA will accept for all
+#   of its members. When a student can't be seated, the slots they could attend
+#   are penalized and stage one is re-run with a preference for seating
+#   everyone else elsewhere.
+#
+# No solver is involved; if every attempt fails, the caller falls back to Z3.
+
+
+# Merges every student with their preferred partners (transitively) into a
+#   single unit, since partners always end up in the same group anyway.
+# Returns a list of (members, common availability) pairs.
+def partner_units(student_availability, student_to_partners) -> list:
+    parent = {s: s for s in student_availability}
+
+    def find(s):
+        while parent[s] != s:
+            parent[s] = parent[parent[s]]
+            s = parent[s]
+        return s
+
+    for s, partners in student_to_partners.items():
+        if s not in parent:
+            continue
+        for p in partners:
+            if p not in parent:
+                print(
+                    f"WARNING: Partner {p} of student {s} was not found in course roster. Ignoring partner preference."
+                )
+                continue
+            parent[find(p)] = find(s)
+
+    members = defaultdict(list)
+    for s in student_availability:
+        members[find(s)].append(s)
+
+    units = []
+    for group in members.values():
+        common = set.intersection(*(student_availability[s] for s in group))
+        units.append((group, common))
+    return units
+
+
+# Stage one: seats units (most constrained first, partner groups before single
+#   students) in TA slots. Each goes to the fullest slot that still has room
+#   for it, so groups fill up, and least penalized slots win ties. When every
+#   slot a unit can attend is full, single students are moved along an
+#   augmenting path (each to another slot they can attend) to free seats, as in
+#   bipartite matching; picking groups from students' common slots instead
+#   leaves most groups with one slot, and those collide in stage two.
+# Returns (groups as (members, common availability), None), or (None, the
+#   availability of a unit that could not be seated).
+def form_groups(units, group_max, pressure, rng, slot_capacity=None):
+    seats = defaultdict(lambda: group_max)
+    if slot_capacity is not None:
+        seats.update(slot_capacity)
+    room = defaultdict(lambda: group_max, seats)
+    seated = defaultdict(list)
+
+    def by_preference(slots):
+        return sorted(slots, key=lambda g: (room[g] == 0, room[g] == seats[g], pressure[g], rng.random()))
+
+    def move(i, old, new):
+        seated[old].remove(i)
+        room[old] += 1
+        seated[new].append(i)
+        room[new] -= 1
+
+    # Frees a seat in one of `slots` (other than `avoid`) by moving single
+    #   students down an augmenting path. Returns that slot, or None.
+    def free_seat(slots, avoid):
+        prev = {}
+        queue = []
+        for g in by_preference(slots):
+            if g != avoid:
+                prev[g] = None
+                queue.append(g)
+        for g in queue:
+            if room[g] > 0:
+                while prev[g] is not None:
+                    i, old = prev[g]
+                    move(i, old, g)
+                    g = old
+                return g
+            for i in seated[g]:
+                if len(units[i][0]) == 1:
+                    for other in units[i][1]:
+                        if other != avoid and other not in prev:
+                            prev[other] = (i, g)
+                            queue.append(other)
+        return None
+
+    order = sorted(range(len(units)), key=lambda i: (-len(units[i][0]), len(units[i][1]), rng.random()))
+    for i in order:
+        members, common = units[i]
+        slot = None
+        if len(members) == 1:
+            slot = free_seat(common, None)
+        else:
+            for g in by_preference(common):
+                if seats[g] < len(members):
+                    continue
+                # make room by moving the single students here elsewhere
+                singles = [j for j in seated[g] if len(units[j][0]) == 1]
+                while room[g] < len(members) and singles:
+                    j = singles.pop()
+                    target = free_seat(units[j][1], g)
+                    if target is None:
+                        break
+                    move(j, g, target)
+                if room[g] >= len(members):
+                    slot = g
+                    break
+        if slot is None:
+            return None, common
+        seated[slot].append(i)
+        room[slot] -= len(members)
+
+    groups = []
+    for unit_ids in seated.values():
+        if unit_ids:
+            members = [s for i in unit_ids for s in units[i][0]]
+            groups.append((members, set.intersection(*(units[i][1] for i in unit_ids))))
+    return groups, None
+
+
+# Stage two: match groups to TA slots (each slot hosts at most one group, and
+#   only if it has room for all of it) using augmenting paths. Returns (slot -> group index, blocked slots), where the
+#   blocked slots are those reachable from groups that could not be matched.
+def match_groups(groups, slot_capacity=None):
+    options = [
+        sorted(
+            slot
+            for slot in common
+            if slot_capacity is None or len(members) <= slot_capacity[slot]
+        )
+        for members, common in groups
+    ]
+    slot_to_group = {}
+    group_to_slot = {}
+    blocked = set()
+
+    for root in range(len(groups)):
+        # BFS over alternating paths; prev[slot] is the group that reached it
+        prev = {}
+        queue = [root]
+        seen = {root}
+        matched = False
+        for gi in queue:
+            for slot in options[gi]:
+                if slot in prev:
+                    continue
+                prev[slot] = gi
+                owner = slot_to_group.get(slot)
+                if owner is None:
+                    # flip the path back to the root
+                    while True:
+                        gi = prev[slot]
+                        old = group_to_slot.get(gi)
+                        slot_to_group[slot] = gi
+                        group_to_slot[gi] = slot
+                        if gi == root:
+                            break
+                        slot = old
+                    matched = True
+                    break
+                if owner not in seen:
+                    seen.add(owner)
+                    queue.append(owner)
+            if matched:
+                break
+        if not matched:
+            blocked.update(prev)
+
+    return slot_to_group, blocked
+
+
+# Runs both stages, retrying stage one up to `attempts` times. slot_capacity
+#   optionally limits slots that already hold some students.
+# Returns a map from TA slot to the students assigned to it, or None on failure.
+def solve(
+    student_availability,
+    student_to_partners,
+    group_max,
+    attempts=50,
+    seed=0,
+    slot_capacity=None,
+):
+    units = partner_units(student_availability, student_to_partners)
+    for members, common in units:
+        if len(members) > group_max:
+            print(f"ERROR: Partner group {members} is larger than {group_max}.")
+            return None
+        if not common:
+            print(f"ERROR: Partner group {members} has no TA slot in common.")
+            return None
+
+    rng = random.Random(seed)
+    pressure = defaultdict(int)
+    for attempt in range(1, attempts + 1):
+        groups, stuck = form_groups(units, group_max, pressure, rng, slot_capacity)
+        if groups is None:
+            print(
+                f"Decomposition attempt {attempt}: a student with {len(stuck)} TA slots could not be seated. Retrying."
+            )
+            blocked = stuck
+        else:
+            slot_to_group, blocked = match_groups(groups, slot_capacity)
+            if len(slot_to_group) == len(groups):
+                return {slot: groups[gi][0] for slot, gi in slot_to_group.items()}
+
+            unmatched = len(groups) - len(slot_to_group)
+            print(
+                f"Decomposition attempt {attempt}: {unmatched} of {len(groups)} groups could not be scheduled. Retrying."
+            )
+        for slot in blocked:
+            pressure[slot] += 1
+
+    return None
@@ -0,0 +1,621 @@
+import contextlib
+import csv
+import re
+import resource
+import threading
+import time
+import tracemalloc
+
+from z3 import *
+
+import decompose
+import exact_cover
+import lns
+import tactics
+from cardinality import ENCODINGS, Counter
+
+# Solver engines for the group assignment model.
+#
+# Every engine takes an Instance (see instance.py) and returns the set of
+#   (student id, TA slot id) pairs that are assigned, or None if it could not
+#   find an assignment. extract_groups() turns that set back into groups, so the
+#   output code doesn't care which engine produced it.
+#
+# Solver-backed engines split solving into start() (encode the instance into a
+#   live solver), check() (solve what is currently asserted) and block() (rule
+#   out solutions too close to a previous one), so that several solutions can
+#   be drawn from one warm solver instead of re-encoding the instance.
+
+
+class Engine:
+    name = ""
+
+    # Name plus configuration, used to tell engines apart in benchmarks.
+    @property
+    def label(self):
+        return self.name
+
+    # The label of the configuration that actually runs on `instance`, which is
+    #   what benchmark results are recorded under.
+    def label_for(self, instance):
+        return self.label
+
+    # Encodes the instance into a live solver. The returned state is engine-specific.
+    def start(self, instance):
+        raise NotImplementedError
+
+    # Solves the current state, assuming every (student id, TA slot id) pair in
+    #   `assumptions` is assigned. Returns the assigned pairs, or None; either
+    #   way state.result is set to "sat", "unsat" or "unknown". Checks under
+    #   assumptions are quiet, since callers usually make many of them.
+    def check(self, state, timeout=None, assumptions=()):
+        raise NotImplementedError
+
+    # Requires that at least min_distance students are assigned to a different
+    #   slot than in `assigned` in every later solution.
+    def block(self, state, assigned, min_distance):
+        raise NotImplementedError
+
+    # Releases any resources held by the solver.
+    def stop(self, state):
+        pass
+
+    def solve(self, instance, timeout=None):
+        state = self.start(instance)
+        try:
+            return self.check(state, timeout)
+        finally:
+            self.stop(state)
+
+    # Yields up to k solutions, each at least min_distance students away from
+    #   every earlier one, as they are found. All of them share one time budget.
+    def enumerate(self, instance, k, min_distance, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        state = self.start(instance)
+        try:
+            for _ in range(k):
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        print("WARNING: Time budget exhausted before finding every solution.")
+                        return
+                assigned = self.check(state, remaining)
+                if assigned is None:
+                    return
+                yield assigned
+                self.block(state, assigned, min_distance)
+        finally:
+            self.stop(state)
+
+
+# Prints the memory of one encoding phase when `enabled`: how far Python's own
+#   allocations peaked above where they stood when the phase began (tracemalloc;
+#   Z3's native memory isn't included), and the process's peak resident set
+#   size so far. The OS only keeps one peak RSS per process, so that one is
+#   cumulative: a phase can only raise it, not report its own.
+@contextlib.contextmanager
+def memory_phase(name, enabled):
+    if not enabled:
+        yield
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.monotonic()
+    yield
+    peak = tracemalloc.get_traced_memory()[1] - before
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    print(
+        f"Memory: {name:<8} {peak / 2**20:+9.1f} MiB Python peak in phase, "
+        f"{rss / 2**10:9.1f} MiB peak RSS so far ({time.monotonic() - start:.2f}s)"
+    )
+
+
+# Number of students assigned to different slots in two solutions.
+def distance(assigned, other_assigned):
+    return len(assigned - other_assigned)
+
+
+# Z3 variables are looked up by name, so the encoder only keeps integer ids around:
+#   assignment_var(s, g) is true IFF student s is assigned to TA slot g.
+ASSIGNMENT_NAME = re.compile(r"assignment_(\d+)_(\d+)")
+
+
+def assignment_var(s, g):
+    return Bool(f"assignment_{s}_{g}")
+
+
+# The original model: one Z3 boolean per (student, TA slot) pair the student is
+#   available for, solved with a tactic chain from tactics.json ("auto": the
+#   one tuned for the instance family). Constraints are generated student by
+#   student and slot by slot and go straight into the solver.
+class Z3Engine(Engine):
+    name = "z3"
+
+    def __init__(self, encoding="pb", tactic="auto", memory_report=False):
+        self.encoding = encoding
+        self.tactic = tactic
+        self.memory_report = memory_report
+
+    @property
+    def label(self):
+        return f"{self.name}/{self.encoding}/{self.tactic}"
+
+    # "auto" resolves to the chain tuned for the instance family.
+    def label_for(self, instance):
+        chain = tactics.resolve(self.tactic, len(instance.student_id_map), instance.group_max)
+        return f"{self.name}/{self.encoding}/{chain}"
+
+    def start(self, instance):
+        student_id_map = instance.student_id_map
+
+        # If not using soft constraints, just use Solver()
+        # solver = Optimize()
+        chain = tactics.resolve(self.tactic, len(student_id_map), instance.group_max)
+        if self.tactic == "auto" and chain != "default":
+            print(
+                f"Using tactic chain {chain} (tuned for {tactics.family(len(student_id_map), instance.group_max)})."
+            )
+        solver = tactics.make_solver(chain, proof=True)
+        solver.set(unsat_core=True)  # must enable core extraction
+        solver.set(":core.minimize", True)  # not sure how good this is
+
+        # Constraints are fed to the solver as they are generated; only tracked
+        #   ones (named) can show up in an unsat core.
+        for phase, constraints in [
+            ("students", self._student_constraints(instance)),
+            ("slots", self._slot_constraints(instance)),
+            ("partners", self._partner_constraints(instance)),
+        ]:
+            with memory_phase(phase, self.memory_report):
+                for constraint, name in constraints:
+                    if name is None:
+                        solver.add(constraint)
+                    else:
+                        solver.assert_and_track(constraint, name)
+
+        # Uncomment this to view the (verbose) set of solver constraints
+        # print(solver)
+
+        return Z3State(instance, solver, chain)
+
+    # everybody gets a group
+    # nobody gets >1 group
+    def _student_constraints(self, instance):
+        for s, login in instance.student_id_map.items():
+            # Limiting by availability /pre/-solver reduces the problem complexity;
+            #   there are no variables for the slots a student can't attend.
+            lits = [
+                assignment_var(s, instance.slot_to_id[g])
+                for g in instance.student_availability[login]
+            ]
+            yield Or(lits), f"{login}_is_assigned"
+            # an extra group never helps, so this is never part of a core
+            counter = Counter(lits, 2, self.encoding, f"once_{s}")
+            for constraint in counter.constraints:
+                yield constraint, None
+            yield counter.at_most(1), None
+
+    # no group is too big
+    # cardinality is expensive; Z3 has a built-in pseudo-boolean engine, and
+    #   cardinality.py has the alternative encodings. Students who aren't
+    #   available for g are already ruled out, so only candidates are counted.
+    def _slot_constraints(self, instance):
+        candidates = {g: [] for g in instance.ta_time_slot_id_map}
+        for s, login in instance.student_id_map.items():
+            for slot in instance.student_availability[login]:
+                candidates[instance.slot_to_id[slot]].append(s)
+        for g, slot in instance.ta_time_slot_id_map.items():
+            lits = [assignment_var(s, g) for s in candidates.pop(g)]
+            capacity = instance.slot_capacity[slot]
+            counter = Counter(lits, capacity + 1, self.encoding, f"count_{g}")
+            for constraint in counter.constraints:
+                yield constraint, None
+            yield counter.at_most(capacity), f"{slot}_size_is_{capacity}_or_0"
+
+    # if student has partners, make sure they are all assigned to the same group
+    def _partner_constraints(self, instance):
+        for s, login in instance.student_id_map.items():
+            if login not in instance.student_to_partners:
+                continue
+            partners = instance.student_to_partners[login]
+            yield And(
+                [
+                    Implies(
+                        assignment_var(s, instance.slot_to_id[slot]),
+                        And(
+                            [
+                                assignment_var(instance.student_to_id[p], instance.slot_to_id[slot])
+                                if slot in instance.student_availability[p]
+                                else BoolVal(False)
+                                for p in partners
+                            ]
+                        ),
+                    )
+                    for slot in instance.student_availability[login]
+                ]
+            ), f"{login}_partners_all_in_or_out"
+
+    def check(self, state, timeout=None, assumptions=()):
+        solver = state.solver
+        if timeout is not None:
+            solver.set(timeout=int(timeout * 1000))
+
+        instance = state.instance
+        for s, g in assumptions:
+            if instance.ta_time_slot_id_map[g] not in instance.student_availability[instance.student_id_map[s]]:
+                # the student isn't available for that slot at all
+                state.result = "unsat"
+                return None
+
+        with memory_phase("check", self.memory_report):
+            result = solver.check(*[assignment_var(s, g) for s, g in assumptions])
+        state.result = str(result)
+        if result == unsat:
+            if not assumptions and state.n_blocked:
+                # the roster is fine; the earlier solutions used up the room
+                print(f"no more solutions at distance {state.min_distance}")
+            elif not assumptions:
+                print("unsat")
+                # Blocking constraints aren't tracked, so only an unblocked core explains anything
+                if state.chain != "default":
+                    print(f"(no unsat core or proof with tactic chain {state.chain})")
+                else:
+                    print(solver.unsat_core())
+                    try:
+                        print(solver.proof())
+                    except Z3Exception:
+                        # Z3's pseudo-boolean solver doesn't record proofs
+                        print("(no proof recorded)")
+            return None
+        if result == unknown:
+            if not assumptions:
+                print(f"unknown: {solver.reason_unknown()}")
+            return None
+
+        # Read the assigned pairs back off the names of the true variables in the
+        #   model, rather than evaluating every possible pair.
+        solution = solver.model()
+        assigned = set()
+        for decl in solution.decls():
+            match = ASSIGNMENT_NAME.fullmatch(decl.name())
+            if match and is_true(solution[decl]):
+                assigned.add((int(match.group(1)), int(match.group(2))))
+        return assigned
+
+    def block(self, state, assigned, min_distance):
+        kept = [assignment_var(s, g) for s, g in assigned]
+        state.solver.add(PbLe([(x, 1) for x in kept], len(kept) - min_distance))
+        state.n_blocked += 1
+        state.min_distance = min_distance
+
+
+class Z3State:
+    def __init__(self, instance, solver, chain="default"):
+        self.instance = instance
+        self.solver = solver
+        self.chain = chain
+        self.n_blocked = 0
+        self.min_distance = None
+        self.result = None
+
+
+# The same constraints compiled to CNF and handed to an in-process CDCL solver
+#   from the python-sat package. Cardinality constraints go through one of
+#   pysat's encodings (see pysat.card.EncType; the cardinality.py names are
+#   accepted too). Variables only exist for the (student, slot) pairs a student
+#   is available for; the rest are false. Clauses go to the solver as they are
+#   generated rather than being collected first.
+class SatEngine(Engine):
+    name = "sat"
+
+    def __init__(self, encoding="seqcounter", sat_solver="glucose4", memory_report=False):
+        self.encoding = encoding
+        self.sat_solver = sat_solver
+        self.memory_report = memory_report
+
+    @property
+    def label(self):
+        return f"{self.name}/{self.encoding}"
+
+    def start(self, instance):
+        try:
+            from pysat.card import CardEnc, EncType
+            from pysat.formula import IDPool
+            from pysat.solvers import Solver as SatSolver
+        except ImportError:
+            raise Exception(
+                "ERROR: The sat engine requires python-sat (pip3 install python-sat)"
+            )
+
+        if self.encoding == "pb":
+            raise Exception("ERROR: The sat engine needs a CNF encoding, not pb")
+        name = {"sortnet": "sortnetwrk"}.get(self.encoding, self.encoding)
+        encodings = [n for n in vars(EncType) if not n.startswith("_")]
+        if name not in encodings:
+            raise Exception(
+                f"ERROR: Unknown cardinality encoding {self.encoding} for the sat engine "
+                f"(expected one of {ENCODINGS[1:]} or a pysat.card.EncType name: {encodings})"
+            )
+        encoding = getattr(EncType, name)
+        pool = IDPool()
+        solver = SatSolver(name=self.sat_solver)
+        # Not every pysat solver can be interrupted (CaDiCaL, Kissat and
+        #   Lingeling can't), and those can't honor a timeout.
+        try:
+            solver.interrupt()
+            solver.clear_interrupt()
+            interruptible = True
+        except NotImplementedError:
+            interruptible = False
+
+        # Boolean variables; var[(s, g)] is true IFF s is assigned to g
+        var = {}
+        slot_to_students = {g: [] for g in instance.ta_time_slot_id_map}
+        with memory_phase("variables", self.memory_report):
+            for s, login in instance.student_id_map.items():
+                for slot in instance.student_availability[login]:
+                    g = instance.slot_to_id[slot]
+                    var[(s, g)] = pool.id((s, g))
+                    slot_to_students[g].append(s)
+
+        # everybody gets exactly one group
+        with memory_phase("students", self.memory_report):
+            for s, login in instance.student_id_map.items():
+                lits = [var[(s, instance.slot_to_id[g])] for g in instance.student_availability[login]]
+                if not lits:
+                    # no slot at all (pysat can't encode "exactly one of none")
+                    solver.add_clause([])
+                    continue
+                solver.append_formula(CardEnc.equals(lits, 1, vpool=pool, encoding=encoding).clauses)
+
+        # no group is too big
+        with memory_phase("slots", self.memory_report):
+            for g in instance.ta_time_slot_id_map:
+                students = slot_to_students.pop(g)
+                capacity = instance.slot_capacity[instance.ta_time_slot_id_map[g]]
+                if len(students) > capacity:
+                    lits = [var[(s, g)] for s in students]
+                    solver.append_formula(
+                        CardEnc.atmost(lits, capacity, vpool=pool, encoding=encoding).clauses
+                    )
+
+        # if student has partners, make sure they are all assigned to the same group
+        with memory_phase("partners", self.memory_report):
+            for s, login in instance.student_id_map.items():
+                for p in instance.student_to_partners.get(login, ()):
+                    p = instance.student_to_id[p]
+                    for slot in instance.student_availability[login]:
+                        g = instance.slot_to_id[slot]
+                        if (p, g) in var:
+                            solver.add_clause([-var[(s, g)], var[(p, g)]])
+                        else:
+                            solver.add_clause([-var[(s, g)]])
+
+        return SatState(solver, var, pool, encoding, interruptible)
+
+    def check(self, state, timeout=None, assumptions=()):
+        solver = state.solver
+        if any(pair not in state.var for pair in assumptions):
+            # the student isn't available for that slot at all
+            state.result = "unsat"
+            return None
+        lits = [state.var[pair] for pair in assumptions]
+
+        with memory_phase("check", self.memory_report):
+            if timeout is not None and not state.interruptible:
+                if not state.warned:
+                    print(f"WARNING: SAT solver {self.sat_solver} can't be interrupted. Ignoring the timeout.")
+                    state.warned = True
+                timeout = None
+            if timeout is None:
+                result = solver.solve(assumptions=lits)
+            else:
+                timer = threading.Timer(timeout, solver.interrupt)
+                timer.start()
+                result = solver.solve_limited(assumptions=lits, expect_interrupt=True)
+                timer.cancel()
+                solver.clear_interrupt()
+
+        state.result = {None: "unknown", False: "unsat", True: "sat"}[result]
+        if result is None:
+            if not assumptions:
+                print("unknown: timed out")
+            return None
+        if not result:
+            if not assumptions and state.n_blocked:
+                print(f"no more solutions at distance {state.min_distance}")
+            elif not assumptions:
+                print("unsat")
+            return None
+        model = set(lit for lit in solver.get_model() if lit > 0)
+        return {pair for pair, v in state.var.items() if v in model}
+
+    def block(self, state, assigned, min_distance):
+        from pysat.card import CardEnc
+
+        kept = [state.var[pair] for pair in assigned]
+        state.n_blocked += 1
+        state.min_distance = min_distance
+        if len(kept) < min_distance:
+            # nobody can be that far away (pysat rejects a negative bound)
+            state.solver.add_clause([])
+            return
+        state.solver.append_formula(
+            CardEnc.atmost(
+                kept, len(kept) - min_distance, vpool=state.pool, encoding=state.encoding
+            ).clauses
+        )
+
+    def stop(self, state):
+        state.solver.delete()
+
+
+class SatState:
+    def __init__(self, solver, var, pool, encoding, interruptible=True):
+        self.solver = solver
+        self.var = var
+        self.pool = pool
+        self.encoding = encoding
+        self.interruptible = interruptible
+        self.warned = False
+        self.n_blocked = 0
+        self.min_distance = None
+        self.result = None
+
+
+# Group-then-schedule decomposition (see decompose.py), falling back to another
+#   engine when no schedule is found.
+class DecomposeEngine(Engine):
+    name = "decompose"
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback if fallback is not None else Z3Engine()
+
+    def solve(self, instance, timeout=None):
+        group_to_students = decompose.solve(
+            instance.student_availability,
+            instance.student_to_partners,
+            instance.group_max,
+            slot_capacity=instance.slot_capacity,
+        )
+        if group_to_students is None:
+            print(
+                f"WARNING: Decomposition failed to schedule every group. Falling back to {self.fallback.name}."
+            )
+            return self.fallback.solve(instance, timeout)
+
+        return {
+            (instance.student_to_id[login], instance.slot_to_id[slot])
+            for slot, logins in group_to_students.items()
+            for login in logins
+        }
+
+    # Decomposition is not incremental, so alternatives come from the fallback.
+    def enumerate(self, instance, k, min_distance, timeout=None):
+        return self.fallback.enumerate(instance, k, min_distance, timeout)
+
+
+# Fixed-size groups as exact cover (see exact_cover.py), falling back to another
+#   engine when there are too many candidate groups to enumerate. Unlike the
+#   SMT model, which only caps group sizes, every non-empty group is full, so
+#   "unsat" here means no assignment with full groups exists.
+class ExactCoverEngine(Engine):
+    name = "exact"
+
+    def __init__(self, fallback=None, max_rows=exact_cover.MAX_ROWS):
+        self.fallback = fallback if fallback is not None else Z3Engine()
+        self.max_rows = max_rows
+
+    def solve(self, instance, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        result, assignment = exact_cover.solve(instance, deadline, self.max_rows)
+        if result == "skipped":
+            print(f"WARNING: Too many candidate groups for exact cover. Falling back to {self.fallback.name}.")
+            remaining = None if deadline is None else max(0.1, deadline - time.monotonic())
+            return self.fallback.solve(instance, remaining)
+        if assignment is None:
+            return None
+
+        return {
+            (instance.student_to_id[login], instance.slot_to_id[slot])
+            for login, slot in assignment.items()
+        }
+
+    # Alternatives come from the fallback.
+    def enumerate(self, instance, k, min_distance, timeout=None):
+        return self.fallback.enumerate(instance, k, min_distance, timeout)
+
+
+# Large-neighborhood search (see lns.py): finds a first solution with another
+#   engine, then improves the groups it forms until the time budget runs out.
+class LNSEngine(Engine):
+    name = "lns"
+
+    # Seconds to optimize for when no timeout is given.
+    DEFAULT_BUDGET = 60
+
+    def __init__(self, start=None, workers=None):
+        self.start_engine = start if start is not None else DecomposeEngine()
+        self.workers = workers
+
+    def solve(self, instance, timeout=None):
+        deadline = time.monotonic() + (self.DEFAULT_BUDGET if timeout is None else timeout)
+        assigned = self.start_engine.solve(instance, timeout)
+        if assigned is None:
+            return None
+
+        assignment = {
+            instance.student_id_map[s]: instance.ta_time_slot_id_map[g] for s, g in assigned
+        }
+        assignment = lns.optimize(instance, assignment, deadline, self.workers)
+        return {
+            (instance.student_to_id[login], instance.slot_to_id[slot])
+            for login, slot in assignment.items()
+        }
+
+    # Alternatives come from the start engine.
+    def enumerate(self, instance, k, min_distance, timeout=None):
+        return self.start_engine.enumerate(instance, k, min_distance, timeout)
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in [Z3Engine, SatEngine, DecomposeEngine, ExactCoverEngine, LNSEngine]
+}
+
+
+# Turns a set of assigned (student id, TA slot id) pairs into a map from TA
+#   slot to the logins of the students assigned to it.
+def extract_groups(instance, assigned):
+    slots_of = {s: [] for s in instance.student_id_map}
+    for s, g in assigned:
+        slots_of[s].append(g)
+
+    group_to_students = {}
+    for s in instance.student_id_map:
+        gs = slots_of[s]
+
+        # check if the students is assigned to multiple groups
+        if len(gs) == 0:
+            raise Exception(f"ERROR: {s} not assigned to any groups")
+        if len(gs) > 1:
+            raise Exception(f"ERROR: {s} assigned to multiple groups: {gs}")
+
+        slot = instance.ta_time_slot_id_map[gs[0]]
+        if slot in group_to_students:
+            group_to_students[slot].append(instance.student_id_map[s])
+        else:
+            group_to_students[slot] = [instance.student_id_map[s]]
+    return group_to_students
+
+
+# Prints the groups (including the empty TA slots among `slots`) and writes
+#   them to a solution CSV.
+def write_solution(group_to_students, slots, path="solution.csv"):
+    for g in sorted(slots, key=lambda g: g.split("(")[1]):
+        if g not in group_to_students:
+            group_to_students[g] = []
+
+    # sort by cs login first, then by date
+    for g in sorted(group_to_students, key=lambda g: (g.split("(")[1], g)):
+        print(f"{g:<35} {group_to_students[g]}")
+
+    with open(path, mode="w") as solution_file:
+        fieldnames = ["TA CS Login", "Time Slot", "Students"]
+        writer = csv.DictWriter(solution_file, fieldnames=fieldnames)
+        writer.writeheader()
+
+        for g in sorted(group_to_students, key=lambda g: (g.split("(")[1], g)):
+            mentor_cs_login = g.split("(")[1].replace(")", "")
+            meeting_time = g.split("(")[0]
+
+            writer.writerow(
+                {
+                    "TA CS Login": mentor_cs_login,
+                    "Time Slot": meeting_time,
+                    "Students": ",".join(group_to_students[g]),
+                }
+            )
@@ -0,0 +1,223 @@
+import random
+import time
+from collections import defaultdict
+
+from decompose import partner_units
+
+# Fixed-size mode as an exact-cover problem: every TA slot ends up with either 0
+#   or exactly its capacity (group_max, or what preprocessing left of it).
+#
+# Partner groups always share a group, so the roster is first merged into units
+#   (see decompose.partner_units). A row is a TA slot plus units that are all
+#   available for it and fill it exactly. A solution is a set of rows that
+#   covers every unit exactly once and every TA slot at most once; slots that
+#   preprocessing already put students in can't be left empty, so they are
+#   covered exactly once too. Partner groups cut the rows down sharply, since a
+#   pair only combines with single students.
+#
+# The search is Knuth's Algorithm X, branching on the uncovered column with the
+#   fewest live rows. Rows are bit positions: each column keeps the rows that
+#   contain it as one Python int, and so do the live rows. Choosing a row is a
+#   few ANDs, and backtracking just goes back to the previous int, so there
+#   are no links to undo as in dancing links.
+#
+# The rows grow with the cube of the number of units per slot, so they are
+#   counted before they are built; past MAX_ROWS the caller should use the SMT
+#   model instead.
+MAX_ROWS = 100_000
+# Nodes searched before the first restart, and how much that grows per restart.
+RESTART_NODES = 1000
+RESTART_GROWTH = 1.3
+
+
+# Number of ways to pick some of `sizes` adding up to exactly `total`.
+def count_subsets(sizes, total):
+    ways = [1] + [0] * total
+    for size in sizes:
+        for t in range(total, size - 1, -1):
+            ways[t] += ways[t - size]
+    return ways[total]
+
+
+# Yields every tuple of `unit_ids` (in order) whose sizes add up to exactly `total`.
+def subsets(unit_ids, sizes, total, start=0):
+    if total == 0:
+        yield ()
+        return
+    for k in range(start, len(unit_ids)):
+        if sizes[unit_ids[k]] <= total:
+            for rest in subsets(unit_ids, sizes, total - sizes[unit_ids[k]], k + 1):
+                yield (unit_ids[k], *rest)
+
+
+# The candidate rows as (slot, unit ids), or None if there are more than
+#   max_rows. Rows for the least contested slots come first, so they are tried
+#   first.
+def candidate_rows(instance, units, max_rows=MAX_ROWS):
+    sizes = [len(members) for members, _ in units]
+    slot_units = defaultdict(list)
+    for i, (_, common) in enumerate(units):
+        for slot in common:
+            slot_units[slot].append(i)
+
+    n_rows = sum(
+        count_subsets([sizes[i] for i in unit_ids], instance.slot_capacity[slot])
+        for slot, unit_ids in slot_units.items()
+    )
+    if n_rows > max_rows:
+        print(f"Exact cover: {n_rows} candidate groups, more than the limit of {max_rows}.")
+        return None
+
+    rows = []
+    for slot in sorted(slot_units, key=lambda slot: (len(slot_units[slot]), slot)):
+        capacity = instance.slot_capacity[slot]
+        if capacity > 0:
+            rows += [(slot, unit_ids) for unit_ids in subsets(slot_units[slot], sizes, capacity)]
+    return rows
+
+
+# Algorithm X over bitset rows. Columns are unit ids, then one per slot: every
+#   row ends with its slot's column, and fills the `seats[slot column]` seats
+#   of that slot. `primary` columns must be covered, the other slots may be.
+#   Rows are tried in a random order when an `rng` is given. Returns ("sat",
+#   chosen row indices), ("unsat", None) or ("unknown", None) once the deadline
+#   (a time.monotonic() value) passes or more than node_limit rows were tried.
+def search(row_columns, primary, seats, n_students, deadline=None, node_limit=None, rng=None):
+    column_rows = defaultdict(int)
+    for r, columns in enumerate(row_columns):
+        for c in columns:
+            column_rows[c] |= 1 << r
+
+    def killed_by(r):
+        killed = 0
+        for c in row_columns[r]:
+            killed |= column_rows[c]
+        return killed
+
+    # The live rows of the most constrained column. Besides the primary columns,
+    #   the slots still open must seat everyone left: with no seats to spare,
+    #   every one of them has to be used, so they become columns too.
+    def branch(alive, uncovered, open_slots, students):
+        live_slots = [c for c in open_slots if column_rows[c] & alive]
+        room = sum(seats[c] for c in live_slots)
+        if room < students:
+            return []
+        columns = uncovered if room > students else uncovered.union(live_slots)
+
+        best, fewest = None, None
+        for c in columns:
+            n = (column_rows[c] & alive).bit_count()
+            if best is None or n < fewest:
+                best, fewest = c, n
+                if n <= 1:
+                    break
+        rows = []
+        candidates = column_rows[best] & alive
+        while candidates:
+            low = candidates & -candidates
+            candidates ^= low
+            rows.append(low.bit_length() - 1)
+        if rng is not None:
+            rng.shuffle(rows)
+        return rows
+
+    alive = (1 << len(row_columns)) - 1
+    uncovered = frozenset(primary)
+    open_slots = frozenset(seats)
+    stack = [(alive, uncovered, open_slots, n_students, branch(alive, uncovered, open_slots, n_students), 0)]
+    chosen = []
+    nodes = 0
+    while stack:
+        alive, uncovered, open_slots, students, rows, i = stack[-1]
+        if i == len(rows):
+            stack.pop()
+            continue
+        r = rows[i]
+        stack[-1] = (alive, uncovered, open_slots, students, rows, i + 1)
+        del chosen[len(stack) - 1 :]
+        chosen.append(r)
+
+        nodes += 1
+        if deadline is not None and nodes % 256 == 0 and time.monotonic() > deadline:
+            return "unknown", None
+        if node_limit is not None and nodes > node_limit:
+            return "unknown", None
+
+        # choosing r kills every row that shares a column with it
+        slot = row_columns[r][-1]
+        uncovered = uncovered.difference(row_columns[r])
+        if not uncovered:
+            return "sat", chosen
+        alive &= ~killed_by(r)
+        open_slots = open_slots - {slot}
+        students -= seats[slot]
+        stack.append((alive, uncovered, open_slots, students, branch(alive, uncovered, open_slots, students), 0))
+    return "unsat", None
+
+
+# Solves the instance in fixed-size mode. Returns (result, {login: slot}): the
+#   result is "sat", "unsat", "unknown" (deadline passed) or "skipped" (too
+#   many rows; nothing was searched).
+def solve(instance, deadline=None, max_rows=MAX_ROWS):
+    units = partner_units(instance.student_availability, instance.student_to_partners)
+    group_max = instance.group_max
+
+    # slots preprocessing left partly filled must get exactly their capacity
+    partial = [
+        slot for slot, capacity in instance.slot_capacity.items() if 0 < capacity < group_max
+    ]
+    n_left = len(instance.student_availability) - sum(
+        instance.slot_capacity[slot] for slot in partial
+    )
+    if n_left < 0 or n_left % group_max != 0:
+        print(
+            f"unsat: {len(instance.student_availability)} students can't fill the {len(partial)} "
+            f"partly filled TA slots and groups of exactly {group_max}."
+        )
+        return "unsat", None
+    # preprocessing placed everyone, so there is nothing left to cover
+    if not units and not partial:
+        return "sat", {}
+
+    rows = candidate_rows(instance, units, max_rows)
+    if rows is None:
+        return "skipped", None
+    slot_column = {slot: len(units) + k for k, slot in enumerate(instance.slot_capacity)}
+    row_columns = [(*unit_ids, slot_column[slot]) for slot, unit_ids in rows]
+    primary = list(range(len(units))) + [slot_column[slot] for slot in partial]
+
+    covered = {c for columns in row_columns for c in columns}
+    stuck = [units[c][0] for c in primary if c < len(units) and c not in covered]
+    stuck += [slot for slot in partial if slot_column[slot] not in covered]
+    if stuck:
+        print(f"unsat: no full group can include {stuck[0]} ({len(stuck)} such units and slots).")
+        return "unsat", None
+
+    seats = {slot_column[slot]: capacity for slot, capacity in instance.slot_capacity.items()}
+    # Restarts: each run gives up after a node limit that grows every time, and
+    #   tries rows in a new random order, so one bad early choice can't sink the
+    #   search. A run that finishes (with either answer) is exhaustive.
+    rng = None
+    node_limit = RESTART_NODES
+    while True:
+        result, chosen = search(
+            row_columns, primary, seats, len(instance.student_availability), deadline, node_limit, rng
+        )
+        if result != "unknown" or (deadline is not None and time.monotonic() > deadline):
+            break
+        rng = rng or random.Random(0)
+        node_limit = int(node_limit * RESTART_GROWTH)
+    if result == "unsat":
+        print(f"unsat: no assignment puts exactly {group_max} students in every group.")
+    if result == "unknown":
+        print("unknown: timed out")
+    if result != "sat":
+        return result, None
+
+    assignment = {}
+    for r in chosen:
+        slot, unit_ids = rows[r]
+        for i in unit_ids:
+            for login in units[i][0]:
+                assignment[login] = slot
+    return "sat", assignment
@@ -1,12 +1,26 @@
 import csv
 from lib2to3.pgen2 import grammar
 import sys
+import argparse
+import multiprocessing
+import secrets
 import random
 from pprint import pprint
 from collections import defaultdict
 
 from z3 import *
 
+import benchmark
+import cubes
+import selection
+import tactics
+from cardinality import ENCODINGS
+from engines import ENGINES, distance, extract_groups, write_solution
+from instance import load_instance
+from preprocess import preprocess
+from reconcile import load_corrections
+from whatif import WhatIf, slot_criticality
+
 # There are quite a few SMT solvers you might use; here's the start of
 # an approach using Z3. But note the SO post below: Z3 may not give you
 # a "best so far" result if it times out before returning an optimal solution.
@@ -46,297 +60,356 @@ from z3 import *
 GROUP_MAX = 3
 
 # Input CSVs are supplied as command line arguments.
-if len(sys.argv) != 6:
-    print(
-        "Usage: groups.py <student_roster.csv> <blocklist.csv> <ta_slots.csv> "
-        "<individual_preferences.csv> <group_preferences.csv>"
-    )
-    sys.exit(1)
-
-all_students_path = sys.argv[1]
-blocklist_path = sys.argv[2]
-ta_slots_path = sys.argv[3]
-individual_prefs_path = sys.argv[4]
-group_prefs_path = sys.argv[5]
-
-# Maps each student id to a set of meeting time preferences.
-student_availability = {}
-
-# Set of all time slots for students to choose from.
-time_slots = set()
-
-# Initialize student_availability by mapping all students to an empty preference set.
-with open(all_students_path, mode="r") as all_students_csv:
-    all_students_reader = csv.DictReader(all_students_csv)
-    for row in all_students_reader:
-        student_availability[row["Student CS Login"].lower().strip()] = set()
-
-# Gather student preferences from individual preference CSV.
-# Keep track of students and their partner preferences in student_to_partners.
-student_to_partners = {}
-with open(individual_prefs_path, mode="r") as individual_prefs_csv:
-    individual_prefs_reader = csv.DictReader(individual_prefs_csv)
-    for row in individual_prefs_reader:
-        # Parse CS login and availabilities from CSV.
-        cs_login = row["Your CS Login"].lower().strip()
-        prefs = row[
-            "Check all mentor meeting slots for which you will be available during the demo period of Integration (11/12–11/13)."
-        ].split(";")
-
-        # Update set of all possible time slots.
-        time_slots.update(prefs)
-
-        if cs_login in student_availability:
-            student_availability[cs_login].update(prefs)
-
-            if "[OPTIONAL] Partner CS Login" in row:
-                partner = row["[OPTIONAL] Partner CS Login"].lower().strip()
-                if partner:
-                    student_to_partners[cs_login] = {partner}
-        else:
-            message = f"ERROR: Student {cs_login} was found in {individual_prefs_path} but was not found in course roster ({all_students_path})"
-            print(message)
-            # raise Exception(message)
-
-
-# Gather student preferences from group preference CSV.
-# Keep track of students and their partner preferences in student_to_partners.
-with open(group_prefs_path, mode="r") as group_prefs_csv:
-    group_prefs_reader = csv.DictReader(group_prefs_csv)
-    for row in group_prefs_reader:
-        # Parse CSV for CS logins of all group members.
-        cs_logins = set()
-        for i in range(1, GROUP_MAX + 1):
-            if f"Partner {i} - CS Login" in row:
-                cs_login = row[f"Partner {i} - CS Login"].lower().strip()
-                cs_logins.add(cs_login)
-
-        # Parse CSV for group availabilities.
-        prefs = row[
-            "Check all mentor meeting slots for which your entire group will be available during the demo period of Integration (11/12–11/13)."
-        ].split(";")
-
-        # Update set of all possible time slots.
-        time_slots.update(prefs)
-
-        for cs_login in cs_logins:
-            if cs_login in student_availability:
-                if student_availability[cs_login] != set():
-                    # student already has preferences!? (filled out both forms, ugh)
-                    print(
-                        f"WARNING: Student {cs_login} appears to have both individual and group preferences. Defaulting to group preferences."
-                    )
-                    student_availability[cs_login] = set()
-                student_availability[cs_login].update(prefs)
-
-                partners = {p for p in cs_logins if p != cs_login}
-                if cs_login in student_to_partners:
-                    student_to_partners[cs_login].update(partners)
-                else:
-                    student_to_partners[cs_login] = partners
+parser = argparse.ArgumentParser(
+    usage="groups.py <student_roster.csv> <blocklist.csv> <ta_slots.csv> "
+    "<individual_preferences.csv> <group_preferences.csv> [options]"
+)
+parser.add_argument("all_students_path")
+parser.add_argument("blocklist_path")
+parser.add_argument("ta_slots_path")
+parser.add_argument("individual_prefs_path")
+parser.add_argument("group_prefs_path")
+parser.add_argument(
+    "--engine",
+    choices=["auto"] + sorted(ENGINES),
+    default="auto",
+    help="auto: the engine that did best on the most similar benchmarked instances "
+    "among z3, sat and decompose (see selection.py; z3 until there are any); z3: the full SMT model; sat: the same model as CNF for an in-process SAT solver; "
+    "decompose: form groups first, then match them to TA slots (falls back to z3); "
+    "exact: exact cover with every group full (falls back to z3 when there are too many "
+    "candidate groups); "
+    "lns: decompose, then improve the groups until --timeout (default 60s)",
+)
+parser.add_argument(
+    "--encoding",
+    help="cardinality encoding for group capacity: pb, seqcounter, totalizer or sortnet "
+    "(default: pb for z3, seqcounter for sat; sat also takes any pysat.card.EncType name)",
+)
+parser.add_argument(
+    "--sat-solver",
+    default="glucose4",
+    help="SAT solver for the sat engine (any pysat.solvers.SolverNames name; cadical, kissat "
+    "and lingeling can't be interrupted, so they ignore --timeout)",
+)
+parser.add_argument("--timeout", type=float, help="solver timeout in seconds")
+parser.add_argument(
+    "--tactic",
+    choices=["auto"] + tactics.chain_names(),
+    default="auto",
+    help="Z3 tactic chain from tactics.json for the z3 engine (auto: the one tuned "
+    "for the instance family, if any)",
+)
+parser.add_argument(
+    "--cubes",
+    type=int,
+    default=0,
+    help="split the search into at most this many cubes and solve them in parallel "
+    "(cube-and-conquer; z3 and sat engines only)",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=multiprocessing.cpu_count(),
+    help="local worker processes for --cubes, --criticality and --engine lns",
+)
+parser.add_argument(
+    "--serve",
+    default="127.0.0.1:0",
+    help="host:port to serve cubes on, so workers on other hosts can join (see cubes.py)",
+)
+parser.add_argument(
+    "--authkey",
+    help="shared secret for workers joining --serve (default: a random token; anyone "
+    "who has it can run code on the workers)",
+)
+parser.add_argument(
+    "--corrections",
+    metavar="PATH",
+    help="reconcile form and blocklist logins against the roster, writing suggested "
+    "corrections to PATH; if PATH already exists, parse the inputs with its corrections "
+    "(see reconcile.py)",
+)
+parser.add_argument(
+    "--memory-report",
+    action="store_true",
+    help="print the peak memory of each encoding phase and solve (z3 and sat engines)",
+)
+parser.add_argument(
+    "--no-preprocess",
+    action="store_true",
+    help="hand the whole instance to the solver instead of fixing forced assignments first",
+)
+parser.add_argument(
+    "--solutions",
+    type=int,
+    default=1,
+    help="number of alternative solutions to find (all share --timeout)",
+)
+parser.add_argument(
+    "--min-distance",
+    type=int,
+    default=1,
+    help="minimum number of students that must move between any two solutions",
+)
+parser.add_argument(
+    "--what-if",
+    action="append",
+    metavar="QUERY",
+    help="check whether the instance stays feasible after some changes, e.g. "
+    "'remove-ta=ta1; move=student/Thurs' (repeatable; '-' reads queries from stdin; "
+    "see whatif.py), then exit",
+)
+parser.add_argument(
+    "--criticality",
+    action="store_true",
+    help="report which TA slots the instance can't do without (checked in parallel "
+    "with --workers), then exit",
+)
+parser.add_argument(
+    "--benchmark",
+    action="store_true",
+    help="time every engine on the given CSVs and on generated instances, then exit",
+)
+parser.add_argument(
+    "--benchmark-encodings",
+    action="store_true",
+    help="time every cardinality encoding with --engine (z3 or sat) on the given CSVs and on "
+    "generated instances, report the fastest, then exit",
+)
+parser.add_argument(
+    "--tune-tactics",
+    metavar="DIR",
+    help="time every tactic chain on the instances under DIR, record the fastest per "
+    "instance family in tactics.json, then exit",
+)
+parser.add_argument(
+    "--benchmark-sizes",
+    default="300,600,1200",
+    help="comma-separated student counts of the generated benchmark instances",
+)
+# Runs the whole pipeline. It lives in a function, behind the __main__ guard,
+#   because worker processes that are spawned rather than forked (the default
+#   on macOS and Windows) re-import this file, and must not run it again.
+def main():
+    args = parser.parse_args()
+
+    all_students_path = args.all_students_path
+    blocklist_path = args.blocklist_path
+    ta_slots_path = args.ta_slots_path
+    individual_prefs_path = args.individual_prefs_path
+    group_prefs_path = args.group_prefs_path
+
+    # Build a single engine from its name (or a benchmark label like "z3/pb/sat")
+    #   and the command line options.
+    #   An explicit --encoding or --tactic wins over the one in the label.
+    def make_engine(name, encoding=None):
+        label = name
+        name, *config = name.split("/")
+        if args.encoding and config and config[0] != args.encoding:
+            print(f"WARNING: Using --encoding {args.encoding} instead of the {config[0]} in {label}.")
+        encoding = encoding or args.encoding or (config[0] if config else None)
+        tactic = args.tactic
+        if len(config) > 1 and config[1] != args.tactic:
+            if args.tactic == "auto":
+                tactic = config[1]
             else:
-                raise Exception(
-                    f"ERROR: Student {cs_login} was found in {group_prefs_path} but was not found in course roster ({all_students_path})"
-                )
-
-for student in student_availability:
-    if student_availability[student] == set():
-        print(
-            f"WARNING: Student {student} has no preferences (either in individual or group form). Defaulting to full availability."
-        )
-        student_availability[student] = set(time_slots)
-
-
-# Gather TA to time slot mapping from TA time slot CSV.
-slot_to_tas = {}
-with open(ta_slots_path, mode="r") as ta_slots_csv:
-    ta_slots_reader = csv.DictReader(ta_slots_csv)
-    for row in ta_slots_reader:
-        ta_login = row["TA CS Login"].lower().strip()
-        slot = row["Time Slot"]
-
-        if slot in slot_to_tas:
-            slot_to_tas[slot].add(ta_login)
-        else:
-            slot_to_tas[slot] = set([ta_login])
-
-# Gather TA blocklists.
-ta_to_blocklist = {}
-with open(blocklist_path, mode="r") as blocklist_csv:
-    blocklist_reader = csv.DictReader(blocklist_csv)
-    for row in blocklist_reader:
-        ta_login = row["TA CS Login"].lower().strip()
-        student_login = row["Student CS Login"].lower().strip()
-
-        if ta_login in ta_to_blocklist:
-            ta_to_blocklist[ta_login].add(student_login)
-        else:
-            ta_to_blocklist[ta_login] = set([student_login])
-
-# Convert student availabilities to accommodate for multiple TAs on a single slot.
-ta_time_slots = set()
-for student in student_availability:
-    new_availabilities = set()
-    for slot in student_availability[student]:
-        if slot in slot_to_tas:
-            for ta in slot_to_tas[slot]:
-                new_slot = f"{slot} ({ta})"
-                if ta not in ta_to_blocklist or student not in ta_to_blocklist[ta]:
-                    # Only add slot for student if TA has not blocklisted the student.
-                    new_availabilities.add(new_slot)
-                ta_time_slots.add(new_slot)
-        else:
-            print(
-                f"WARNING: No TAs found for slot {slot}. Removing slot from student availability."
+                print(f"WARNING: Using --tactic {args.tactic} instead of the {config[1]} in {label}.")
+        if name == "z3":
+            return ENGINES[name](
+                encoding=encoding or "pb",
+                tactic=tactic,
+                memory_report=args.memory_report,
             )
-
-    student_availability[student] = new_availabilities
-
-# Map each student to a unique integer id.
-student_id_map = {idx: student for idx, student in enumerate(student_availability)}
-student_to_id = {student_id_map[idx]: idx for idx in student_id_map}
-
-# Map each time slot to a unique integer id.
-ta_time_slot_id_map = {
-    idx: ta_time_slot for idx, ta_time_slot in enumerate(ta_time_slots)
-}
-slot_to_id = {ta_time_slot_id_map[slot]: slot for slot in ta_time_slot_id_map}
-
-N_STUDENTS = len(student_id_map)
-if N_STUDENTS % GROUP_MAX != 0:
-    print(
-        "WARNING: Number of students not divisible by group size. Some groups must be larger than others."
-    )
-
-# If not using soft constraints, just use Solver()
-# solver = Optimize()
-set_param(proof=True)
-solver = Solver()
-solver.set(unsat_core=True)  # must enable core extraction
-solver.set(":core.minimize", True)  # not sure how good this is
-
-# Boolean variables; assignment[s][g] is true IFF s is assigned to g
-# Some unused variables, but these shouldn't appear in constraints
-assignment = {
-    s: {g: z3.Bool(f"assignment_{s}_{g}") for g in ta_time_slot_id_map}
-    for s in student_id_map
-}
-
-# everybody gets a group
-# nobody gets >1 group
-for s in student_id_map:
-    # Limiting by availability /pre/-solver reduces the problem complexity
-    login = student_id_map[s]
-    potential_s_assignments = [
-        assignment[s][slot_to_id[g]] for g in student_availability[login]
-    ]
-    solver.assert_and_track(Or(potential_s_assignments), f"{login}_is_assigned")
-
-    # non availability
-    impossible_s_assignments = [
-        assignment[s][g]
-        for g in ta_time_slot_id_map
-        if ta_time_slot_id_map[g] not in student_availability[login]
-    ]
-    for a in impossible_s_assignments:
-        solver.assert_and_track(Not(a), f"{login}_is_not_assigned_to_{a}")
-
-    for a in potential_s_assignments:
-        # Hack: "a2 != a" produces an error; Z3 tries to protect us from using references to
-        #   boolean variables in the *solver* as if they were booleans in the program.
-        #   100% sure there is a better way than comparing the string rep of each...
-        solver.assert_and_track(
-            Implies(
-                a, Not(Or([a2 for a2 in potential_s_assignments if str(a2) != str(a)]))
-            ),
-            f"{login}_assignment_to_{a}_is_unique",
+        if name == "sat":
+            return ENGINES[name](
+                encoding=encoding or "seqcounter",
+                sat_solver=args.sat_solver,
+                memory_report=args.memory_report,
+            )
+        if name == "lns":
+            return ENGINES[name](start=make_engine("decompose", encoding), workers=args.workers)
+        return ENGINES[name](fallback=make_engine("z3", encoding))
+
+    corrections = {}
+    if args.corrections:
+        corrections = load_corrections(
+            args.corrections,
+            all_students_path,
+            [individual_prefs_path],
+            [group_prefs_path],
+            blocklist_path,
         )
 
-# no group is too big
-# cardinality is expensive; Z3 has a built-in pseudo-boolean engine;
-for g in ta_time_slot_id_map:
-    assigned_to_g = [assignment[s][g] for s in student_id_map]
-    solver.assert_and_track(
-        Or(
-            # here we say that any true x is worth 1, and the sum must be <= GROUP_MAX
-            PbLe([(x, 1) for x in assigned_to_g], GROUP_MAX),
-        ),
-        f"{ta_time_slot_id_map[g]}_size_is_{GROUP_MAX}_or_0",
+    instance = load_instance(
+        all_students_path,
+        blocklist_path,
+        ta_slots_path,
+        individual_prefs_path,
+        group_prefs_path,
+        GROUP_MAX,
+        corrections,
     )
+    slot_to_id = instance.slot_to_id
 
-# if student has partners, make sure they are all assigned to the same group
-for s in student_id_map:
-    cs_login = student_id_map[s]
-    if cs_login in student_to_partners:
-        for g in ta_time_slot_id_map:
-            solver.assert_and_track(
-                Implies(
-                    assignment[s][g],
-                    And(
-                        [
-                            assignment[student_to_id[p]][g]
-                            for p in student_to_partners[cs_login]
-                        ]
-                    ),
-                ),
-                f"{cs_login}_partners_all_in_or_out_of_{g}",
-            )
-
-
-# Uncomment this to view the (verbose) set of solver constraints
-# print(solver)
-
-if solver.check() == unsat:
-    print("unsat")
-    print(solver.unsat_core())
-    print(solver.proof())
-else:
-    # Note this won't include values for un-used variables
-    # trying to evaluate an unused variable may produce a confusing error.
-    #   We could tell "eval" to enable model completion, but that would just give
-    #   a default value (which may not be False!)
-    solution = solver.model()
-    group_to_students = {}
-    for s in student_id_map:
-        gs = [g for g in ta_time_slot_id_map if solution.eval(assignment[s][g])]
-
-        # check if the students is assigned to multiple groups
-        if len(gs) == 0:
-            raise Exception(f"ERROR: {s} not assigned to any groups")
-        if len(gs) > 1:
-            raise Exception(f"ERROR: {s} assigned to multiple groups: {gs}")
+    N_STUDENTS = len(instance.student_id_map)
+    if N_STUDENTS % GROUP_MAX != 0:
+        print(
+            "WARNING: Number of students not divisible by group size. Some groups must be larger than others."
+        )
 
-        # print(f"Student {s}: {gs}")
-        if ta_time_slot_id_map[gs[0]] in group_to_students:
-            group_to_students[ta_time_slot_id_map[gs[0]]].append(student_id_map[s])
+    # What a solve would hand the engine: the preprocessed instance (or None if
+    #   preprocessing finds it infeasible), or the instance itself with --no-preprocess.
+    def solver_view(instance):
+        if args.no_preprocess:
+            return instance
+        preprocessed = preprocess(instance)
+        return None if preprocessed is None else preprocessed[0]
+
+    if args.benchmark_encodings and args.engine not in ["auto", "z3", "sat"]:
+        print(f"ERROR: --benchmark-encodings needs the z3 or sat engine ({args.engine} takes no encoding).")
+        sys.exit(1)
+
+    if args.benchmark or args.benchmark_encodings:
+        # benchmarked (and recorded) as the solver would see them, so the profiles
+        #   in selection.json match the ones --engine auto looks up
+        instances = []
+        generated = [
+            (f"generated-{size}", benchmark.random_instance(int(size), GROUP_MAX))
+            for size in args.benchmark_sizes.split(",")
+        ]
+        for name, benchmarked in [(all_students_path, instance)] + generated:
+            benchmarked = solver_view(benchmarked)
+            if benchmarked is not None:
+                instances.append((name, benchmarked))
+        if args.benchmark:
+            engines = [make_engine(name) for name in ENGINES]
         else:
-            group_to_students[ta_time_slot_id_map[gs[0]]] = [student_id_map[s]]
-
-    for g in sorted(slot_to_id, key=lambda g: g.split("(")[1]):
-        if g not in group_to_students:
-            group_to_students[g] = []
-
-    # sort by cs login first, then by date
-    for g in sorted(group_to_students, key=lambda g: (g.split("(")[1], g)):
-        print(f"{g:<35} {group_to_students[g]}")
-
-    with open("solution.csv", mode="w") as solution_file:
-        fieldnames = ["TA CS Login", "Time Slot", "Students"]
-        writer = csv.DictWriter(solution_file, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for g in sorted(group_to_students, key=lambda g: (g.split("(")[1], g)):
-            mentor_cs_login = g.split("(")[1].replace(")", "")
-            meeting_time = g.split("(")[0]
-
-            writer.writerow(
-                {
-                    "TA CS Login": mentor_cs_login,
-                    "Time Slot": meeting_time,
-                    "Students": ",".join(group_to_students[g]),
-                }
-            )
+            name = "z3" if args.engine == "auto" else args.engine
+            encodings = ENCODINGS if name == "z3" else ENCODINGS[1:]
+            engines = [make_engine(name, encoding) for encoding in encodings]
+        results = benchmark.run(instances, engines, args.timeout)
+        if args.benchmark_encodings:
+            best = benchmark.fastest(results, sorted({label for _, label in results}))
+            print(f"Fastest encoding for this instance family: {best}")
+        selection.record(instances, results)
+        print(f"Recorded the results in {selection.HISTORY_PATH}.")
+        sys.exit(0)
+
+    # What-if queries (see whatif.py) run against the whole instance on one warm
+    #   solver: the first check pays for the encoding, the rest reuse it. The
+    #   queries are answered even when the unchanged instance is infeasible,
+    #   since asking which change repairs it is the point then.
+    if args.what_if or args.criticality:
+        model = WhatIf(instance)
+        baseline = model.ask("", args.timeout)
+        for query in args.what_if or []:
+            if query == "-":
+                for line in sys.stdin:
+                    if line.strip():
+                        model.ask(line.strip(), args.timeout)
+            else:
+                model.ask(query, args.timeout)
+        if args.criticality:
+            if baseline == "sat":
+                slot_criticality(model, args.workers, args.timeout)
+            else:
+                print("ERROR: Slot criticality needs a feasible instance to start from.")
+        sys.exit(0 if baseline == "sat" else 1)
+
+    # Tactic tuning (see tactics.py): every chain on every (preprocessed) instance
+    #   under the directory, grouped by instance family.
+    if args.tune_tactics:
+        config = tactics.load_config()
+        families = defaultdict(list)
+        for name, tuned in benchmark.load_directory(args.tune_tactics, GROUP_MAX):
+            # solves see the preprocessed instance, so that's what gets tuned
+            tuned = solver_view(tuned)
+            if tuned is None:
+                continue
+            families[tactics.family(len(tuned.student_id_map), GROUP_MAX)].append((name, tuned))
+        if not families:
+            print(f"ERROR: No instances found under {args.tune_tactics}.")
+            sys.exit(1)
+        for family, instances in sorted(families.items()):
+            print(f"Instance family {family} ({len(instances)} instances):")
+            engines = [
+                ENGINES["z3"](encoding=args.encoding or "pb", tactic=chain)
+                for chain in tactics.chain_names(config)
+            ]
+            results = benchmark.run(instances, engines, args.timeout)
+            selection.record(instances, results)
+            best = benchmark.fastest(results, [engine.label for engine in engines])
+            config["winners"][family] = best.split("/")[-1]
+            print(f"Fastest tactic chain for {family}: {config['winners'][family]}")
+        tactics.save_config(config)
+        print(f"Saved the winners to {tactics.CONFIG_PATH}.")
+        sys.exit(0)
+
+    # Fixpoint preprocessing (see preprocess.py): the solver only sees what's left,
+    #   and the fixed students are merged back into every solution.
+    residual, fixed = instance, {}
+    if not args.no_preprocess:
+        preprocessed = preprocess(instance)
+        if preprocessed is None:
+            sys.exit(1)
+        residual, fixed = preprocessed
+
+    # Turns the solver's assignment back into groups, including the fixed students.
+    def groups_with_fixed(assigned):
+        group_to_students = extract_groups(residual, assigned)
+        for login, slot in fixed.items():
+            group_to_students.setdefault(slot, []).append(login)
+        return group_to_students
+
+    # The profile of what the solver sees, and the engine it gets (see selection.py).
+    profile = selection.profile_instance(residual)
+    print(f"Instance profile: {selection.describe(profile)}")
+    if args.engine == "auto":
+        # cubes split the z3 or sat model, so only those two are candidates then
+        label, reason = selection.select(profile, ["z3", "sat"] if args.cubes else selection.AUTO_ENGINES)
+        engine = make_engine(label)
+        print(f"Engine: {engine.label_for(residual)} ({reason})")
+    else:
+        engine = make_engine(args.engine)
+        print(f"Engine: {engine.label_for(residual)} (--engine)")
+
+    if args.cubes:
+        if engine.name not in ["z3", "sat"]:
+            print("ERROR: --cubes needs the z3 or sat engine.")
+            sys.exit(1)
+        host, port = args.serve.rsplit(":", 1)
+        authkey = (args.authkey or secrets.token_hex(8)).encode()
+        assigned = cubes.solve(
+            residual, engine, args.cubes, args.workers, (host, int(port)), authkey, args.timeout
+        )
+        if assigned is not None:
+            write_solution(groups_with_fixed(assigned), slot_to_id)
+    elif args.solutions == 1:
+        assigned = engine.solve(residual, args.timeout)
+        if assigned is not None:
+            write_solution(groups_with_fixed(assigned), slot_to_id)
+    else:
+        # Solutions stream out as they are found: solution.csv, solution_2.csv, ...
+        solutions = []
+        for assigned in engine.enumerate(
+            residual, args.solutions, args.min_distance, args.timeout
+        ):
+            solutions.append(assigned)
+            path = "solution.csv" if len(solutions) == 1 else f"solution_{len(solutions)}.csv"
+            print(f"Solution {len(solutions)} ({path}):")
+            write_solution(groups_with_fixed(assigned), slot_to_id, path)
+            print()
+
+        print(f"Found {len(solutions)} of {args.solutions} solutions.")
+        if len(solutions) > 1:
+            print("Pairwise distances (number of students assigned to a different slot):")
+            for i, assigned in enumerate(solutions):
+                print(
+                    f"{i + 1:>4} "
+                    + " ".join(f"{distance(assigned, other):>5}" for other in solutions)
+                )
 
 
 if __name__ == "__main__":
+    main()
     print()
@@ -0,0 +1,261 @@
+import csv
+import os
+import re
+
+# Parsed input for the group assignment model, shared by every engine.
+#
+# Form exports have renamed some columns between semesters (e.g. "Time Slot" vs
+#   "Mentor Meeting Slot", ";" vs ", " separated checkboxes), so the parser
+#   accepts each known variant rather than a single exact header.
+INDIVIDUAL_SLOTS_COLUMN = "Check all mentor meeting slots for which you will be available"
+GROUP_SLOTS_COLUMN = "Check all mentor meeting slots for which your entire group will be available"
+PARTNER_COLUMNS = ["[OPTIONAL] Partner CS Login", "(optional) Partner CS Login"]
+TA_SLOT_COLUMNS = ["Time Slot", "Mentor Meeting Slot"]
+
+
+class Instance:
+    def __init__(
+        self,
+        student_availability,
+        student_to_partners,
+        ta_time_slots,
+        group_max,
+        slot_capacity=None,
+        blocked=None,
+    ):
+        # Maps each student login to the set of "{slot} ({ta})" TA slots they can attend.
+        self.student_availability = student_availability
+        # Maps each student login to the set of logins they must be grouped with.
+        self.student_to_partners = student_to_partners
+        self.group_max = group_max
+        # Maps each TA slot to the number of students it can still take (less
+        #   than group_max once preprocessing has placed some students there).
+        self.slot_capacity = {slot: group_max for slot in ta_time_slots}
+        if slot_capacity is not None:
+            self.slot_capacity.update(slot_capacity)
+        # Maps each (student login, TA slot) pair the student is available for
+        #   but blocklisted from to the TA whose blocklist row rules it out.
+        self.blocked = blocked or {}
+
+        # Map each student to a unique integer id.
+        self.student_id_map = {
+            idx: student for idx, student in enumerate(student_availability)
+        }
+        self.student_to_id = {
+            self.student_id_map[idx]: idx for idx in self.student_id_map
+        }
+
+        # Map each time slot to a unique integer id.
+        self.ta_time_slot_id_map = {
+            idx: ta_time_slot for idx, ta_time_slot in enumerate(sorted(ta_time_slots))
+        }
+        self.slot_to_id = {
+            self.ta_time_slot_id_map[slot]: slot for slot in self.ta_time_slot_id_map
+        }
+
+
+# Returns the first column of the CSV whose header starts with one of the prefixes.
+def find_column(fieldnames, prefixes, path):
+    for name in fieldnames:
+        if any(name.startswith(prefix) for prefix in prefixes):
+            return name
+    raise Exception(f"ERROR: {path} has no column starting with any of {prefixes}")
+
+
+# Which of the five input CSVs a file is, going by words in its name (as in data/).
+INPUT_NAMES = [
+    ("all_students_path", ["roster"]),
+    ("blocklist_path", ["blocklist"]),
+    ("ta_slots_path", ["time slot", "time_slot"]),
+    ("individual_prefs_path", ["form b", "individual"]),
+    ("group_prefs_path", ["form a", "group_pref"]),
+]
+
+
+# Maps each load_instance() path argument to the one CSV in `directory` that
+#   matches it. Arguments with no (or more than one) match are left out.
+def find_inputs(directory, files=None):
+    files = os.listdir(directory) if files is None else files
+    paths = {}
+    for argument, words in INPUT_NAMES:
+        matches = [f for f in files if f.endswith(".csv") and any(w in f.lower() for w in words)]
+        if len(matches) == 1:
+            paths[argument] = os.path.join(directory, matches[0])
+    return paths
+
+
+# Splits a checkbox response into individual time slots.
+def split_slots(value):
+    return [slot.strip() for slot in re.split(r"[;,]", value) if slot.strip()]
+
+
+def load_instance(
+    all_students_path,
+    blocklist_path,
+    ta_slots_path,
+    individual_prefs_path,
+    group_prefs_path,
+    group_max,
+    corrections=None,
+) -> Instance:
+    # Maps mistyped logins to roster logins (see reconcile.py).
+    corrections = corrections or {}
+
+    def login_in(value):
+        login = value.lower().strip()
+        return corrections.get(login, login)
+
+    # Maps each student id to a set of meeting time preferences.
+    student_availability = {}
+
+    # Set of all time slots for students to choose from.
+    time_slots = set()
+
+    # Initialize student_availability by mapping all students to an empty preference set.
+    with open(all_students_path, mode="r") as all_students_csv:
+        all_students_reader = csv.DictReader(all_students_csv)
+        for row in all_students_reader:
+            student_availability[row["Student CS Login"].lower().strip()] = set()
+
+    # Gather student preferences from individual preference CSV.
+    # Keep track of students and their partner preferences in student_to_partners.
+    student_to_partners = {}
+    with open(individual_prefs_path, mode="r") as individual_prefs_csv:
+        individual_prefs_reader = csv.DictReader(individual_prefs_csv)
+        fieldnames = individual_prefs_reader.fieldnames or []
+        slots_column = find_column(
+            fieldnames, [INDIVIDUAL_SLOTS_COLUMN], individual_prefs_path
+        )
+        partner_column = next((c for c in PARTNER_COLUMNS if c in fieldnames), None)
+        for row in individual_prefs_reader:
+            # Parse CS login and availabilities from CSV.
+            cs_login = login_in(row["Your CS Login"])
+            prefs = split_slots(row[slots_column])
+
+            # Update set of all possible time slots.
+            time_slots.update(prefs)
+
+            if cs_login in student_availability:
+                student_availability[cs_login].update(prefs)
+
+                if partner_column is not None:
+                    partner = login_in(row[partner_column])
+                    if partner:
+                        student_to_partners[cs_login] = {partner}
+            else:
+                message = f"ERROR: Student {cs_login} was found in {individual_prefs_path} but was not found in course roster ({all_students_path})"
+                print(message)
+                # raise Exception(message)
+
+    # Gather student preferences from group preference CSV.
+    # Keep track of students and their partner preferences in student_to_partners.
+    with open(group_prefs_path, mode="r") as group_prefs_csv:
+        group_prefs_reader = csv.DictReader(group_prefs_csv)
+        slots_column = find_column(
+            group_prefs_reader.fieldnames or [], [GROUP_SLOTS_COLUMN], group_prefs_path
+        )
+        for row in group_prefs_reader:
+            # Parse CSV for CS logins of all group members.
+            cs_logins = set()
+            for i in range(1, group_max + 1):
+                if f"Partner {i} - CS Login" in row:
+                    cs_login = login_in(row[f"Partner {i} - CS Login"])
+                    cs_logins.add(cs_login)
+
+            # Parse CSV for group availabilities.
+            prefs = split_slots(row[slots_column])
+
+            # Update set of all possible time slots.
+            time_slots.update(prefs)
+
+            for cs_login in cs_logins:
+                if cs_login in student_availability:
+                    if student_availability[cs_login] != set():
+                        # student already has preferences!? (filled out both forms, ugh)
+                        print(
+                            f"WARNING: Student {cs_login} appears to have both individual and group preferences. Defaulting to group preferences."
+                        )
+                        student_availability[cs_login] = set()
+                    student_availability[cs_login].update(prefs)
+
+                    partners = {p for p in cs_logins if p != cs_login}
+                    if cs_login in student_to_partners:
+                        student_to_partners[cs_login].update(partners)
+                    else:
+                        student_to_partners[cs_login] = partners
+                else:
+                    raise Exception(
+                        f"ERROR: Student {cs_login} was found in {group_prefs_path} but was not found in course roster ({all_students_path})"
+                    )
+
+    for student in student_availability:
+        if student_availability[student] == set():
+            print(
+                f"WARNING: Student {student} has no preferences (either in individual or group form). Defaulting to full availability."
+            )
+            student_availability[student] = set(time_slots)
+
+    # Partners that aren't on the roster can't be placed, so every engine ignores them.
+    for student, partners in list(student_to_partners.items()):
+        for p in sorted(partners - set(student_availability)):
+            print(
+                f"WARNING: Partner {p} of student {student} was not found in course roster. Ignoring partner preference."
+            )
+        student_to_partners[student] = partners & set(student_availability)
+        if not student_to_partners[student]:
+            del student_to_partners[student]
+
+    # Gather TA to time slot mapping from TA time slot CSV.
+    slot_to_tas = {}
+    with open(ta_slots_path, mode="r") as ta_slots_csv:
+        ta_slots_reader = csv.DictReader(ta_slots_csv)
+        slot_column = find_column(
+            ta_slots_reader.fieldnames or [], TA_SLOT_COLUMNS, ta_slots_path
+        )
+        for row in ta_slots_reader:
+            ta_login = row["TA CS Login"].lower().strip()
+            slot = row[slot_column].strip()
+
+            if slot in slot_to_tas:
+                slot_to_tas[slot].add(ta_login)
+            else:
+                slot_to_tas[slot] = set([ta_login])
+
+    # Gather TA blocklists.
+    ta_to_blocklist = {}
+    with open(blocklist_path, mode="r") as blocklist_csv:
+        blocklist_reader = csv.DictReader(blocklist_csv)
+        for row in blocklist_reader:
+            ta_login = row["TA CS Login"].lower().strip()
+            student_login = login_in(row["Student CS Login"])
+
+            if ta_login in ta_to_blocklist:
+                ta_to_blocklist[ta_login].add(student_login)
+            else:
+                ta_to_blocklist[ta_login] = set([student_login])
+
+    # Convert student availabilities to accommodate for multiple TAs on a single slot.
+    ta_time_slots = set()
+    blocked = {}
+    for student in student_availability:
+        new_availabilities = set()
+        for slot in student_availability[student]:
+            if slot in slot_to_tas:
+                for ta in slot_to_tas[slot]:
+                    new_slot = f"{slot} ({ta})"
+                    if ta not in ta_to_blocklist or student not in ta_to_blocklist[ta]:
+                        # Only add slot for student if TA has not blocklisted the student.
+                        new_availabilities.add(new_slot)
+                    else:
+                        blocked[(student, new_slot)] = ta
+                    ta_time_slots.add(new_slot)
+            else:
+                print(
+                    f"WARNING: No TAs found for slot {slot}. Removing slot from student availability."
+                )
+
+        student_availability[student] = new_availabilities
+
+    return Instance(
+        student_availability, student_to_partners, ta_time_slots, group_max, blocked=blocked
+    )
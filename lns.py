@@ -0,0 +1,210 @@
+import contextlib
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+
+from z3 import *
+
+# Large-neighborhood search over a feasible assignment.
+#
+# The forms only record which slots a student can attend, so the quality of a
+#   solution is measured by its groups: a non-empty group of n students costs
+#   (group_max - n) ** 2, so lone students cost the most, and a student's
+#   score is the cost of their group. (Students fixed by preprocessing count
+#   towards the group in their slot.)
+#
+# Starting from any feasible solution, every round frees a few neighborhoods
+#   from the incumbent, always whole groups so partners move together:
+#     slots - a handful of random TA slots, undersized ones more likely;
+#     day   - slots on one day;
+#     poor  - the groups of students with the worst scores.
+#   Each one is re-solved optimally by a small Z3 Optimize in a worker process
+#   while every other student stays where they are (freed students can also
+#   join slots outside the neighborhood that have room). Improvements touching
+#   disjoint slots are all applied, and the loop stops at the deadline (or
+#   once every group is full).
+NEIGHBORHOODS = ["slots", "day", "poor"]
+# Time limit in seconds for each neighborhood.
+SUBPROBLEM_TIMEOUT = 5
+
+
+def group_cost(size, group_max):
+    return 0 if size == 0 else (group_max - size) ** 2
+
+
+# Total cost of an assignment ({login: slot}).
+def cost(instance, assignment):
+    size = defaultdict(int)
+    for slot in assignment.values():
+        size[slot] += 1
+    return sum(
+        group_cost(instance.group_max - instance.slot_capacity[slot] + size[slot], instance.group_max)
+        for slot in instance.slot_capacity
+    )
+
+
+# Each worker keeps the instance rather than receiving it with every task.
+_instance = None
+
+
+def _start_worker(instance):
+    global _instance
+    _instance = instance
+
+
+# Re-solves one neighborhood: places every student in `freed` optimally, given
+#   the number of other students (`load`) in each slot. Returns {login: slot},
+#   or None if no better placement was found in time.
+def reoptimize(task):
+    freed, load, timeout = task
+    instance = _instance
+    group_max = instance.group_max
+
+    optimizer = Optimize()
+    optimizer.set(timeout=int(timeout * 1000))
+
+    # Boolean variables; x[(s, g)] is true IFF freed student s moves to g
+    x = {}
+    for s in freed:
+        for g in instance.student_availability[s]:
+            if load[g] < instance.slot_capacity[g]:
+                x[(s, g)] = Bool(f"x_{s}_{g}")
+
+    slot_to_students = defaultdict(list)
+    for s, g in x:
+        slot_to_students[g].append(s)
+
+    # everybody gets exactly one group
+    for s in freed:
+        optimizer.add(PbEq([(x[(s, g)], 1) for g in instance.student_availability[s] if (s, g) in x], 1))
+
+    # no group is too big
+    for g, students in slot_to_students.items():
+        optimizer.add(PbLe([(x[(s, g)], 1) for s in students], instance.slot_capacity[g] - load[g]))
+
+    # partners are freed together, and stay together
+    for s in freed:
+        for p in instance.student_to_partners.get(s, ()):
+            if p in instance.student_availability:
+                for g in instance.student_availability[s]:
+                    if (s, g) in x:
+                        optimizer.add(Implies(x[(s, g)], x.get((p, g), False)))
+
+    # The cost of each slot is a weighted soft constraint per group size:
+    #   joins[(g, k)] is true IFF exactly k freed students join g.
+    for g, students in slot_to_students.items():
+        base = group_max - instance.slot_capacity[g] + load[g]
+        lits = [(x[(s, g)], 1) for s in students]
+        for k in range(instance.slot_capacity[g] - load[g] + 1):
+            weight = group_cost(base + k, group_max)
+            if weight > 0:
+                joins = Bool(f"joins_{g}_{k}")
+                optimizer.add(joins == PbEq(lits, k))
+                optimizer.add_soft(Not(joins), weight)
+
+    result = optimizer.check()
+    if result == unsat:
+        return None
+    try:
+        # on a timeout, the model is the best one found so far (if any)
+        model = optimizer.model()
+    except Z3Exception:
+        return None
+    moves = {}
+    for (s, g), v in x.items():
+        if is_true(model.eval(v)):
+            moves[s] = g
+    return moves if len(moves) == len(freed) else None
+
+
+# Chooses whole groups to free, about `size` students in all.
+def neighborhood(kind, instance, assignment, size, rng):
+    groups = defaultdict(list)
+    for login, slot in assignment.items():
+        groups[slot].append(login)
+
+    def score(slot):
+        return group_cost(
+            instance.group_max - instance.slot_capacity[slot] + len(groups[slot]), instance.group_max
+        )
+
+    slots = list(groups)
+    if kind == "day":
+        day = rng.choice(sorted({slot.split()[0] for slot in slots}))
+        slots = [slot for slot in slots if slot.split()[0] == day]
+        rng.shuffle(slots)
+    elif kind == "poor":
+        rng.shuffle(slots)
+        slots.sort(key=score, reverse=True)
+    else:
+        # undersized groups are twice as likely to come first
+        slots.sort(key=lambda slot: rng.random() * (2 if score(slot) else 1), reverse=True)
+
+    freed = []
+    for slot in slots:
+        if len(freed) >= size:
+            break
+        freed += groups[slot]
+    return freed
+
+
+# Improves `assignment` ({login: slot}) until the deadline (a time.monotonic()
+#   value). Returns the best assignment found.
+def optimize(instance, assignment, deadline, workers=None, size=30, seed=0):
+    rng = random.Random(seed)
+    assignment = dict(assignment)
+    best = cost(instance, assignment)
+    print(f"LNS: starting from cost {best}.")
+    # Pool workers (e.g. multicourse.py's) can't start processes of their own,
+    #   so there the neighborhoods are re-solved one at a time in-process.
+    serial = multiprocessing.current_process().daemon
+    workers = workers or (1 if serial else multiprocessing.cpu_count())
+    if serial:
+        _start_worker(instance)
+        pool = contextlib.nullcontext()
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_start_worker, initargs=(instance,))
+
+    with pool:
+        round = 0
+        while best > 0 and time.monotonic() < deadline:
+            round += 1
+            load = defaultdict(int)
+            for slot in assignment.values():
+                load[slot] += 1
+            tasks = []
+            for i in range(workers):
+                kind = NEIGHBORHOODS[(round + i) % len(NEIGHBORHOODS)]
+                freed = neighborhood(kind, instance, assignment, size, rng)
+                freed_load = dict(load)
+                for login in freed:
+                    freed_load[assignment[login]] -= 1
+                timeout = min(SUBPROBLEM_TIMEOUT, max(0.1, deadline - time.monotonic()))
+                tasks.append((freed, defaultdict(int, freed_load), timeout))
+
+            # Apply every improvement that doesn't touch a slot an earlier one did.
+            improvements = []
+            results = map(reoptimize, tasks) if serial else pool.map(reoptimize, tasks)
+            for (freed, _, _), moves in zip(tasks, results):
+                if moves is None:
+                    continue
+                touched = {assignment[login] for login in freed} | set(moves.values())
+                candidate = dict(assignment)
+                candidate.update(moves)
+                delta = cost(instance, candidate) - best
+                if delta < 0:
+                    improvements.append((delta, touched, moves))
+            improvements.sort(key=lambda improvement: improvement[0])
+            applied = set()
+            for delta, touched, moves in improvements:
+                if touched & applied:
+                    continue
+                assignment.update(moves)
+                applied |= touched
+            if applied:
+                previous, best = best, cost(instance, assignment)
+                print(f"LNS round {round}: cost {previous} -> {best}.")
+
+    print(f"LNS: finished after {round} rounds with cost {best}.")
+    return assignment
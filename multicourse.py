@@ -0,0 +1,188 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+from collections import defaultdict
+
+from engines import ENGINES, extract_groups, write_solution
+from instance import Instance, find_inputs, load_instance
+
+# Joint solving for courses that share mentor TAs.
+#
+# Every course is loaded against one global TA time slot table, so the same
+#   "{slot} ({ta})" TA slot shows up in several courses, and each one may only
+#   be used by one of them. Instead of one model over every course, each course
+#   is solved on its own (in parallel) and the courses are coordinated through
+#   the shared slots with a repair loop:
+#     - a slot used by more than one course goes to the course that has lost
+#       it most often (its price), then to the one whose group there has the
+#       fewest other options; the others are banned from it and re-solved;
+#     - a re-solve first avoids every slot other courses currently use, and
+#       only falls back to just its bans if that's infeasible;
+#     - a course that is infeasible under its bans gets the slots it lost
+#       reserved for it, and the courses holding them are re-solved instead.
+#   The loop stops when no slot is shared, or after max_rounds.
+
+
+# The instance without `slots`, or None if that leaves a student with no slot.
+def without_slots(instance, slots):
+    student_availability = {}
+    for login, available in instance.student_availability.items():
+        student_availability[login] = available - slots
+        if not student_availability[login]:
+            return None
+    return Instance(
+        student_availability,
+        instance.student_to_partners,
+        set(instance.slot_capacity) - slots,
+        instance.group_max,
+        slot_capacity={g: c for g, c in instance.slot_capacity.items() if g not in slots},
+        blocked=instance.blocked,
+    )
+
+
+# Solves one course in a worker process. Returns (name, {slot: [logins]} or
+#   None, solver output).
+def solve_course(task):
+    name, instance, bans, avoid, engine_name, timeout = task
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        for banned in [bans | avoid, bans] if avoid - bans else [bans]:
+            restricted = without_slots(instance, banned)
+            if restricted is None:
+                continue
+            assigned = ENGINES[engine_name]().solve(restricted, timeout)
+            if assigned is not None:
+                return name, extract_groups(restricted, assigned), log.getvalue()
+    return name, None, log.getvalue()
+
+
+# Solves every course in `courses` ({name: Instance}) so that no TA slot is
+#   used by two of them. Returns {name: {slot: [logins]}}, or None.
+def solve(courses, engine_name="decompose", workers=None, timeout=None, max_rounds=20):
+    bans = {name: set() for name in courses}
+    reserved = {}
+    losses = defaultdict(int)
+    groups = {}
+    pending = set(courses)
+
+    workers = workers or min(len(courses), multiprocessing.cpu_count())
+    with multiprocessing.Pool(workers) as pool:
+        for round in range(1, max_rounds + 1):
+            used_by = defaultdict(set)
+            for name, course_groups in groups.items():
+                for slot in course_groups:
+                    used_by[slot].add(name)
+
+            tasks = []
+            for name in sorted(pending):
+                avoid = {slot for slot, names in used_by.items() if names - {name}}
+                tasks.append((name, courses[name], set(bans[name]), avoid, engine_name, timeout))
+            pending = set()
+            for name, result, log in pool.imap_unordered(solve_course, tasks):
+                if result is not None:
+                    groups[name] = result
+                    continue
+
+                lost = {slot for slot in bans[name] if reserved.get(slot) is None}
+                if not lost:
+                    print(log, end="")
+                    if bans[name]:
+                        print(
+                            f"ERROR: Course {name} is infeasible without the TA slots reserved for other courses."
+                        )
+                    else:
+                        print(f"ERROR: Course {name} is infeasible on its own.")
+                    return None
+                # the course needs (some of) the slots it lost: they are now its own
+                for slot in lost:
+                    reserved[slot] = name
+                bans[name] -= lost
+                groups.pop(name, None)
+                pending.add(name)
+                print(f"Round {round}: course {name} needs {len(lost)} slots it lost back; reserving them.")
+
+            # Hand every shared slot to one course; the others are banned from it.
+            used_by = defaultdict(set)
+            for name, course_groups in groups.items():
+                for slot in course_groups:
+                    used_by[slot].add(name)
+            losers = []
+            for slot, names in sorted(used_by.items()):
+                if len(names) < 2 and reserved.get(slot) in (None, *names):
+                    continue
+                if slot in reserved:
+                    winner = reserved[slot]
+                else:
+                    winner = max(
+                        names,
+                        key=lambda name: (
+                            losses[(name, slot)],
+                            -flexibility(courses[name], groups[name][slot], bans[name]),
+                            name,
+                        ),
+                    )
+                losers += [(name, slot) for name in names - {winner}]
+            n_shared = len({slot for _, slot in losers})
+            for name, slot in losers:
+                bans[name].add(slot)
+                losses[(name, slot)] += 1
+                groups.pop(name, None)
+                pending.add(name)
+
+            print(
+                f"Round {round}: solved {len(tasks)} courses, {n_shared} shared TA slots, "
+                f"{len(pending)} courses to re-solve."
+            )
+            if not pending:
+                return groups
+
+    print(f"ERROR: TA slots are still shared between courses after {max_rounds} rounds.")
+    return None
+
+
+# How many other slots the students of a group could move to (the fewest
+#   among them). Groups with few options keep a shared slot.
+def flexibility(instance, logins, bans):
+    return min(len(instance.student_availability[login] - bans) - 1 for login in logins)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="multicourse.py <ta_slots.csv> <course_dir> [<course_dir> ...] [options]"
+    )
+    parser.add_argument("ta_slots_path", help="TA time slots shared by every course")
+    parser.add_argument(
+        "course_dirs",
+        nargs="+",
+        help="one directory per course with its roster, blocklist and both forms",
+    )
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="decompose")
+    parser.add_argument("--group-max", type=int, default=3)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per course)")
+    parser.add_argument("--timeout", type=float, help="solver timeout in seconds, per course solve")
+    parser.add_argument("--rounds", type=int, default=20, help="maximum number of repair rounds")
+    args = parser.parse_args()
+
+    courses = {}
+    for directory in args.course_dirs:
+        paths = find_inputs(directory)
+        paths["ta_slots_path"] = args.ta_slots_path
+        if len(paths) < 5:
+            print(f"ERROR: {directory} needs a roster, a blocklist and both forms.")
+            sys.exit(1)
+        name = os.path.basename(os.path.normpath(directory))
+        courses[name] = load_instance(group_max=args.group_max, **paths)
+
+    course_groups = solve(courses, args.engine, args.workers, args.timeout, args.rounds)
+    if course_groups is None:
+        sys.exit(1)
+
+    for name, groups in sorted(course_groups.items()):
+        taken = {slot for other, g in course_groups.items() if other != name for slot in g}
+        path = f"solution_{name}.csv"
+        print(f"Course {name} ({path}):")
+        write_solution(groups, [slot for slot in courses[name].slot_capacity if slot not in taken], path)
+        print()
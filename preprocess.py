@@ -0,0 +1,140 @@
+from collections import defaultdict
+
+from decompose import partner_units
+from instance import Instance
+
+# Python-side propagation before encoding.
+#
+# Many decisions are forced by the availability data alone. Rather than leave
+#   them to the solver, this pass applies the following rules until nothing
+#   changes, printing every reduction:
+#     - partners share a group, so each member can only use the slots the
+#       whole partner group has in common (no common slot: infeasible);
+#     - a student (or partner group) with exactly one eligible slot is fixed
+#       to it, which uses up part of that slot's capacity;
+#     - a slot without room for a partner group is removed from its options,
+#       so a slot filled by a fixed group is reserved for it;
+#     - an empty slot with fewer eligible students than the smallest non-zero
+#       group size can never be used, so it is closed.
+#   What remains is returned as a smaller Instance with per-slot capacities,
+#   along with the fixed assignments to merge back into the solution.
+
+
+# Returns (residual Instance, {login: fixed TA slot}), or None if the rules
+#   already prove the instance infeasible.
+def preprocess(instance, min_group_size=1):
+    units = partner_units(instance.student_availability, instance.student_to_partners)
+    capacity = dict(instance.slot_capacity)
+    load = defaultdict(int)
+    closed = set()
+    fixed = {}
+
+    availability = {}
+    for i, (members, common) in enumerate(units):
+        availability[i] = set(common)
+        if len(members) > 1:
+            removed = sum(len(instance.student_availability[m] - common) for m in members)
+            if removed:
+                print(
+                    f"Preprocessing: partner group {members} restricted to their {len(common)} common slots ({removed} options removed)."
+                )
+            if not common:
+                print(f"ERROR: Partner group {members} has no TA slot in common.")
+                return None
+
+    changed = True
+    while changed:
+        changed = False
+
+        # a unit with exactly one eligible slot is fixed to it
+        for i, slots in availability.items():
+            if i in fixed:
+                continue
+            members = units[i][0]
+            if not slots:
+                print(f"ERROR: Students {members} have no eligible TA slot left.")
+                return None
+            if len(slots) == 1:
+                (slot,) = slots
+                fixed[i] = slot
+                load[slot] += len(members)
+                changed = True
+                print(f"Preprocessing: fixed {members} to {slot} (their only eligible slot).")
+                if load[slot] > capacity[slot]:
+                    print(f"ERROR: More students are fixed to {slot} than it can hold.")
+                    return None
+
+        eligible = defaultdict(int)
+        for i, slots in availability.items():
+            if i not in fixed:
+                for slot in slots:
+                    eligible[slot] += len(units[i][0])
+
+        for slot in capacity:
+            if slot in closed:
+                continue
+            remaining = capacity[slot] - load[slot]
+
+            # an unused slot that can never reach a valid group size is closed
+            if load[slot] == 0 and eligible[slot] < min_group_size:
+                closed.add(slot)
+                for i, slots in availability.items():
+                    if i not in fixed:
+                        slots.discard(slot)
+                changed = True
+                print(
+                    f"Preprocessing: closed {slot} ({eligible[slot]} eligible students, fewer than {min_group_size})."
+                )
+                continue
+
+            # a slot without room for a unit is not an option for it
+            too_big = [
+                i
+                for i, slots in availability.items()
+                if i not in fixed and slot in slots and len(units[i][0]) > remaining
+            ]
+            for i in too_big:
+                availability[i].discard(slot)
+            if too_big:
+                changed = True
+                reason = "reserved by fixed students" if remaining == 0 else f"only {remaining} places left"
+                print(
+                    f"Preprocessing: removed {slot} from {len(too_big)} students or partner groups ({reason})."
+                )
+
+    # Build the residual instance out of everyone who isn't fixed.
+    fixed_logins = {}
+    for i, slot in fixed.items():
+        for login in units[i][0]:
+            fixed_logins[login] = slot
+
+    student_availability = {}
+    for i, (members, _) in enumerate(units):
+        if i not in fixed:
+            for login in members:
+                student_availability[login] = set(availability[i])
+    student_to_partners = {
+        login: {p for p in partners if p in student_availability}
+        for login, partners in instance.student_to_partners.items()
+        if login in student_availability
+    }
+    open_slots = {
+        slot: capacity[slot] - load[slot]
+        for slot in capacity
+        if slot not in closed and capacity[slot] > load[slot]
+    }
+    residual = Instance(
+        student_availability,
+        student_to_partners,
+        set(open_slots),
+        instance.group_max,
+        slot_capacity=open_slots,
+        blocked=instance.blocked,
+    )
+
+    print(
+        f"Preprocessing: fixed {len(fixed_logins)} students, closed {len(closed)} slots; "
+        f"{len(student_availability)} students and {len(open_slots)} slots left for the solver "
+        f"(from {len(instance.student_availability)} and {len(instance.slot_capacity)})."
+    )
+    return residual, fixed_logins
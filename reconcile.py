@@ -0,0 +1,221 @@
+import csv
+import os
+from collections import defaultdict
+
+# Roster reconciliation for malformed logins.
+#
+# Students mistype their own and their partners' logins on the forms (extra
+#   letters, swapped digits, a full email address), and TAs do the same in the
+#   blocklist. Instead of raising on (or dropping) every login that isn't in
+#   the roster, this stage looks each one up in an index over the roster and
+#   writes a single correction file:
+#     - one row per unknown login, with every place it appears, the closest
+#       roster logins and, when one match is clearly best, a Correction;
+#     - one row per asymmetric partner claim (A names B, but B named someone
+#       else or never filled out a form), for a human to chase up.
+#   The file is meant to be reviewed and edited; once it exists, later runs use
+#   its Correction column instead of reconciling again.
+#
+# Any column whose header contains "CS Login" holds student logins, except
+#   "TA CS Login". On an individual form, the first one is the submitter's own.
+
+# Largest edit distance filled in as a Correction without a human's say-so.
+AUTO_DISTANCE = 2
+# Number of suggestions listed per unknown login.
+N_SUGGESTIONS = 3
+# Number of n-gram candidates checked with the exact edit distance.
+N_CANDIDATES = 30
+
+CORRECTION_COLUMNS = ["Login", "Correction", "Distance", "Suggestions", "Found In", "Note"]
+
+
+# Edit distance between a and b, giving up (returning bound + 1) once it
+#   exceeds bound.
+def edit_distance(a, b, bound):
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            )
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+# Character trigrams of a login, padded so short logins have some too.
+def ngrams(login):
+    padded = f"^^{login}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+# Trigram index over the roster: candidates share the most trigrams with the
+#   query, and only those are checked with the exact edit distance.
+class LoginIndex:
+    def __init__(self, logins):
+        self.logins = set(logins)
+        self.postings = defaultdict(list)
+        for login in self.logins:
+            for gram in ngrams(login):
+                self.postings[gram].append(login)
+
+    # Returns up to k (login, distance) pairs, closest first.
+    def suggest(self, login, k=N_SUGGESTIONS):
+        if login in self.logins:
+            return [(login, 0)]
+        # "jdoe@brown.edu" is almost always a login typed as an email address
+        if "@" in login:
+            login = login.split("@")[0]
+            if login in self.logins:
+                return [(login, 0)]
+
+        shared = defaultdict(int)
+        for gram in ngrams(login):
+            for candidate in self.postings.get(gram, ()):
+                shared[candidate] += 1
+        candidates = sorted(shared, key=lambda c: (-shared[c], c))[:N_CANDIDATES]
+
+        bound = max(len(login), 1)
+        scored = []
+        for candidate in candidates:
+            d = edit_distance(login, candidate, bound)
+            if d <= bound:
+                scored.append((d, candidate))
+        scored.sort()
+        return [(candidate, d) for d, candidate in scored[:k]]
+
+
+def login_columns(fieldnames):
+    return [
+        name for name in fieldnames or [] if "CS Login" in name and not name.startswith("TA ")
+    ]
+
+
+def read_logins(path, column):
+    with open(path, mode="r") as f:
+        return [row[column].lower().strip() for row in csv.DictReader(f) if row[column].strip()]
+
+
+# Reconciles the forms and blocklist against the roster. Returns
+#   (rows for the correction file, {login: correction}).
+def reconcile(all_students_path, individual_paths, group_paths, blocklist_path):
+    index = LoginIndex(read_logins(all_students_path, "Student CS Login"))
+
+    # unknown login -> ["file:row (column)", ...]
+    found_in = defaultdict(list)
+    # ([owners], [logins in the row]); an individual form row is owned by its
+    #   submitter, a group form row by everyone in it
+    rows = []
+
+    for path, individual in [(p, True) for p in individual_paths] + [(p, False) for p in group_paths]:
+        with open(path, mode="r") as f:
+            reader = csv.DictReader(f)
+            columns = login_columns(reader.fieldnames)
+            for line, row in enumerate(reader, 2):
+                logins = []
+                for column in columns:
+                    login = row[column].lower().strip()
+                    if not login:
+                        continue
+                    if login not in index.logins:
+                        found_in[login].append(f"{os.path.basename(path)}:{line} ({column})")
+                    logins.append(login)
+                if logins:
+                    owners = logins[:1] if individual else logins
+                    rows.append((owners, logins))
+
+    with open(blocklist_path, mode="r") as f:
+        for line, row in enumerate(csv.DictReader(f), 2):
+            login = row["Student CS Login"].lower().strip()
+            if login and login not in index.logins:
+                found_in[login].append(f"{os.path.basename(blocklist_path)}:{line} (Student CS Login)")
+
+    corrections = {}
+    report = []
+    for login in sorted(found_in):
+        suggestions = index.suggest(login)
+        correction, note = "", "no close match in the roster"
+        if suggestions:
+            best, d = suggestions[0]
+            tied = len(suggestions) > 1 and suggestions[1][1] == d
+            if d > AUTO_DISTANCE:
+                note = "too far from any roster login"
+            elif tied:
+                note = "ambiguous, pick one of the suggestions"
+            else:
+                correction, note = best, "closest roster login"
+        if correction:
+            corrections[login] = correction
+        report.append(
+            {
+                "Login": login,
+                "Correction": correction,
+                "Distance": suggestions[0][1] if suggestions else "",
+                "Suggestions": " ".join(f"{s}:{d}" for s, d in suggestions),
+                "Found In": "; ".join(found_in[login]),
+                "Note": note,
+            }
+        )
+
+    # Partner claims, with the corrections applied.
+    claims = defaultdict(set)
+    has_rows = set()
+    for owners, logins in rows:
+        logins = [corrections.get(login, login) for login in logins]
+        for owner in owners:
+            owner = corrections.get(owner, owner)
+            has_rows.add(owner)
+            claims[owner].update(p for p in logins if p != owner)
+    for a in sorted(claims):
+        for b in sorted(claims[a]):
+            if b not in index.logins or a in claims[b]:
+                continue
+            if b in has_rows:
+                named = ", ".join(sorted(claims[b])) or "nobody"
+                note = f"asymmetric partner claim: {a} names {b}, but {b} names {named}"
+            else:
+                note = f"unconfirmed partner claim: {a} names {b}, who filled out no form"
+            report.append(
+                {"Login": a, "Correction": "", "Distance": "", "Suggestions": "", "Found In": "", "Note": note}
+            )
+
+    return report, corrections
+
+
+# Reads the {login: correction} mapping out of a (reviewed) correction file.
+def read_corrections(path):
+    corrections = {}
+    with open(path, mode="r") as f:
+        for row in csv.DictReader(f):
+            login, correction = row["Login"].lower().strip(), row["Correction"].lower().strip()
+            if login and correction:
+                corrections[login] = correction
+    return corrections
+
+
+# Returns the {login: correction} mapping to parse the inputs with. If the
+#   correction file at `path` already exists it is used as-is (it may have been
+#   edited); otherwise the inputs are reconciled and the file is written.
+def load_corrections(path, all_students_path, individual_paths, group_paths, blocklist_path):
+    if os.path.exists(path):
+        corrections = read_corrections(path)
+        print(
+            f"Using {len(corrections)} login corrections from {path} (delete it to reconcile again)."
+        )
+        return corrections
+
+    report, corrections = reconcile(all_students_path, individual_paths, group_paths, blocklist_path)
+    with open(path, mode="w") as f:
+        writer = csv.DictWriter(f, fieldnames=CORRECTION_COLUMNS)
+        writer.writeheader()
+        writer.writerows(report)
+    n_unknown = sum(1 for row in report if row["Found In"])
+    print(
+        f"Reconciliation: {n_unknown} unknown logins ({len(corrections)} corrected), "
+        f"{len(report) - n_unknown} partner claims to check; see {path}."
+    )
+    return corrections
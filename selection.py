@@ -0,0 +1,171 @@
+import json
+import math
+import os
+
+import benchmark
+
+# Instance profiles and automatic engine selection.
+#
+# profile() summarizes an instance in a handful of features:
+#   students, slots - roster size and number of "{slot} ({ta})" TA slots
+#   density         - average share of the TA slots a student can attend
+#   tightness       - students / total slot capacity
+#   partners        - share of students in a partner group
+#   blocklist       - share of the availability TA blocklists removed
+#   components      - connected components of the student/TA slot graph
+#                     (students are linked to their slots and partners)
+#   sizes           - the size-set shape: "max3" for groups.py's GROUP_MAX,
+#                     "sizes4,5,6" for term_project.py's GROUP_SIZES
+#
+# Benchmark runs (groups.py --benchmark, --benchmark-encodings and
+#   --tune-tactics) record every instance's profile with the time each engine
+#   label took in selection.json. `--engine auto`, the default, then runs the
+#   label that did best on the NEIGHBORS recorded instances nearest to this
+#   one (with the same size-set shape), or DEFAULT_ENGINE when there are none.
+#
+# Only engines that answer the same question compete: exact's unsat only rules
+#   out all-full groups, and lns always spends its whole time budget, so their
+#   times aren't comparable with the rest and auto never picks them.
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "selection.json")
+DEFAULT_ENGINE = "z3/pb"
+AUTO_ENGINES = ["z3", "sat", "decompose"]
+# Number of recorded instances an engine is chosen from.
+NEIGHBORS = 5
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return {"instances": []}
+    with open(path, mode="r") as f:
+        history = json.load(f)
+    history.setdefault("instances", [])
+    return history
+
+
+def save_history(history, path=HISTORY_PATH):
+    with open(path, mode="w") as f:
+        json.dump(history, f, indent=2)
+        f.write("\n")
+
+
+def profile(student_availability, student_to_partners, slot_capacity, sizes, n_blocked=0) -> dict:
+    n_students = len(student_availability)
+    n_available = sum(len(available) for available in student_availability.values())
+
+    # components, with a union-find over students and slots
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    in_partner_group = set()
+    for login, available in student_availability.items():
+        find(("student", login))
+        for slot in available:
+            parent[find(("student", login))] = find(("slot", slot))
+        for p in student_to_partners.get(login, ()):
+            if p in student_availability:
+                parent[find(("student", login))] = find(("student", p))
+                in_partner_group |= {login, p}
+    components = {find(("student", login)) for login in student_availability}
+
+    return {
+        "students": n_students,
+        "slots": len(slot_capacity),
+        "density": round(n_available / max(1, n_students * len(slot_capacity)), 4),
+        "tightness": round(n_students / max(1, sum(slot_capacity.values())), 4),
+        "partners": round(len(in_partner_group) / max(1, n_students), 4),
+        "blocklist": round(n_blocked / max(1, n_available + n_blocked), 4),
+        "components": len(components),
+        "sizes": sizes,
+    }
+
+
+# The profile of an Instance (see instance.py) in groups.py's GROUP_MAX mode.
+def profile_instance(instance) -> dict:
+    n_blocked = sum(1 for login, _ in instance.blocked if login in instance.student_availability)
+    return profile(
+        instance.student_availability,
+        instance.student_to_partners,
+        instance.slot_capacity,
+        f"max{instance.group_max}",
+        n_blocked,
+    )
+
+
+def describe(profile) -> str:
+    return (
+        f"{profile['students']} students, {profile['slots']} TA slots, "
+        f"density {profile['density']:.3f}, tightness {profile['tightness']:.2f}, "
+        f"partners {profile['partners']:.2f}, blocklist {profile['blocklist']:.3f}, "
+        f"{profile['components']} components, {profile['sizes']}"
+    )
+
+
+# Counts are compared on a log scale, shares as they are.
+def features(profile) -> list:
+    return [
+        math.log2(profile["students"] + 1),
+        math.log2(profile["slots"] + 1),
+        profile["density"],
+        profile["tightness"],
+        profile["partners"],
+        profile["blocklist"],
+        math.log2(profile["components"] + 1),
+    ]
+
+
+def distance(profile, other):
+    return math.dist(features(profile), features(other))
+
+
+# Records benchmark.run() results ({(instance name, engine label): seconds or
+#   None}) for the (name, Instance) pairs that were run. Re-running an instance
+#   replaces the times of the labels run again.
+def record(instances, results, path=HISTORY_PATH):
+    history = load_history(path)
+    for name, instance in instances:
+        entry = {"name": name, "profile": profile_instance(instance), "results": {}}
+        for other in history["instances"]:
+            if other["name"] == name and other["profile"] == entry["profile"]:
+                entry = other
+                break
+        else:
+            history["instances"].append(entry)
+        for (instance_name, label), seconds in results.items():
+            if instance_name == name:
+                entry["results"][label] = None if seconds is None else round(seconds, 4)
+    save_history(history, path)
+
+
+# Picks an engine label for the profile among labels of the `engines` named.
+#   Returns (label, reason).
+def select(profile, engines, history=None):
+    history = history or load_history()
+    similar = [
+        entry
+        for entry in history["instances"]
+        if entry["profile"]["sizes"] == profile["sizes"]
+        and any(label.split("/")[0] in engines for label in entry["results"])
+    ]
+    if not similar:
+        return DEFAULT_ENGINE, "no benchmark results for this kind of instance yet"
+
+    nearest = sorted(similar, key=lambda entry: distance(profile, entry["profile"]))[:NEIGHBORS]
+    results = {
+        (i, label): seconds
+        for i, entry in enumerate(nearest)
+        for label, seconds in entry["results"].items()
+        if label.split("/")[0] in engines
+    }
+    labels = sorted({label for _, label in results})
+    best = benchmark.fastest(results, labels)
+    times = [seconds for (_, label), seconds in results.items() if label == best and seconds is not None]
+    return best, (
+        f"best on the {len(nearest)} most similar benchmarked instances: "
+        f"solved {len(times)} in {sum(times):.2f}s"
+    )
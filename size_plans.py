@@ -0,0 +1,180 @@
+import multiprocessing
+
+from z3 import *
+
+import tactics
+from cardinality import Counter
+from decompose import partner_units
+
+# Group-size plans for term_project.py.
+#
+# Rather than letting Z3 work out how many groups of each size to form (a
+#   disjunction of PbEq per slot), the counts are enumerated up front: every
+#   combination of sizes that adds up to the roster, fits in the available TA
+#   slots and leaves room for the pre-formed groups. Each plan is then a
+#   fixed-capacity instance, solved in its own worker process; the first
+#   feasible plan wins.
+
+
+# Enumerates {size: count} plans for n_students, ranked by closeness to
+#   default_size (total distance of every group's size from the default, then
+#   fewest groups).
+def enumerate_plans(n_students, group_sizes, default_size, n_slots, unit_sizes) -> list:
+    sizes = sorted(size for size in group_sizes if size > 0)
+    if unit_sizes and max(unit_sizes) > max(sizes):
+        return []
+
+    # pre-formed groups of a valid size keep their own group
+    reserved = {size: sum(1 for u in unit_sizes if u == size) for size in sizes}
+
+    plans = []
+
+    def extend(i, remaining, counts):
+        if i == len(sizes):
+            if remaining == 0 and sum(counts.values()) <= n_slots:
+                plans.append(dict(counts))
+            return
+        size = sizes[i]
+        for count in range(reserved[size], remaining // size + 1):
+            counts[size] = count
+            extend(i + 1, remaining - count * size, counts)
+        counts.pop(size, None)
+
+    extend(0, n_students, {})
+    plans.sort(
+        key=lambda plan: (
+            sum(count * abs(size - default_size) for size, count in plan.items()),
+            sum(plan.values()),
+        )
+    )
+    return plans
+
+
+# Solves one fixed-capacity plan with Z3. Runs in a worker process, so it only
+#   takes plain data. Returns (plan, map from TA slot to students) or (plan, None).
+def solve_plan(task):
+    plan, student_availability, student_to_partners, ta_time_slots, timeout, encoding, chain = task
+    sizes = [size for size, count in plan.items() if count > 0]
+
+    solver = tactics.make_solver(chain)
+    if timeout is not None:
+        solver.set(timeout=int(timeout * 1000))
+
+    # Boolean variables; assignment[(s, g)] is true IFF s is assigned to g.
+    #   Only pairs where s is available for g get a variable.
+    assignment = {
+        (s, g): Bool(f"assignment_{s}_{g}")
+        for s in student_availability
+        for g in student_availability[s]
+    }
+    # group_size[(g, k)] is true IFF the group in slot g has exactly k students
+    group_size = {(g, k): Bool(f"size_{g}_{k}") for g in ta_time_slots for k in sizes}
+
+    # everybody gets exactly one group
+    for s in student_availability:
+        solver.add(PbEq([(assignment[(s, g)], 1) for g in student_availability[s]], 1))
+
+    # every slot has one of the planned sizes (or is empty)
+    slot_to_students = {g: [] for g in ta_time_slots}
+    for s, g in assignment:
+        slot_to_students[g].append(s)
+    for g in ta_time_slots:
+        counter = Counter(
+            [assignment[(s, g)] for s in slot_to_students[g]],
+            max(sizes) + 1,
+            encoding,
+            f"count_{g}",
+        )
+        solver.add(counter.constraints)
+        solver.add(PbLe([(group_size[(g, k)], 1) for k in sizes], 1))
+        for k in sizes:
+            solver.add(Implies(group_size[(g, k)], counter.equals(k)))
+        solver.add(Or([group_size[(g, k)] for k in sizes] + [counter.equals(0)]))
+
+    # exactly as many groups of each size as planned
+    for k in sizes:
+        solver.add(PbEq([(group_size[(g, k)], 1) for g in ta_time_slots], plan[k]))
+
+    # if student has partners, make sure they are all assigned to the same group
+    for s, partners in student_to_partners.items():
+        if s not in student_availability:
+            continue
+        n_members = len(partners) + 1
+        for g in student_availability[s]:
+            for p in partners:
+                solver.add(Implies(assignment[(s, g)], assignment.get((p, g), False)))
+            # if the number of partners is a valid group size, no new partners are assigned to the group
+            if n_members in sizes:
+                solver.add(Implies(assignment[(s, g)], group_size[(g, n_members)]))
+
+    if solver.check() != sat:
+        return plan, None
+
+    model = solver.model()
+    group_to_students = {}
+    for (s, g), x in assignment.items():
+        if is_true(model.eval(x)):
+            group_to_students.setdefault(g, []).append(s)
+    return plan, group_to_students
+
+
+# Solves the best max_plans plans in parallel and returns the groups of the
+#   first feasible one, or None.
+def solve(
+    student_availability,
+    student_to_partners,
+    ta_time_slots,
+    group_sizes,
+    default_size,
+    workers=None,
+    max_plans=8,
+    timeout=None,
+    encoding="pb",
+    chain="default",
+):
+    units = partner_units(student_availability, student_to_partners)
+    for members, common in units:
+        if not common:
+            print(f"ERROR: Partner group {members} has no TA slot in common.")
+            return None
+
+    plans = enumerate_plans(
+        len(student_availability),
+        group_sizes,
+        default_size,
+        len(ta_time_slots),
+        [len(members) for members, _ in units if len(members) > 1],
+    )
+    if not plans:
+        print("ERROR: No combination of group sizes fits the roster and TA slots.")
+        return None
+
+    plans = plans[:max_plans]
+    print(f"Trying {len(plans)} group-size plans:")
+    for plan in plans:
+        print(f"  {describe_plan(plan)}")
+
+    # partners that aren't on the roster are ignored (see partner_units), so
+    #   they mustn't be required in the group either
+    partners = {
+        s: {p for p in ps if p in student_availability}
+        for s, ps in student_to_partners.items()
+        if s in student_availability
+    }
+    partners = {s: ps for s, ps in partners.items() if ps}
+    tasks = [
+        (plan, student_availability, partners, sorted(ta_time_slots), timeout, encoding, chain)
+        for plan in plans
+    ]
+    with multiprocessing.Pool(workers or min(len(tasks), multiprocessing.cpu_count())) as pool:
+        for plan, group_to_students in pool.imap_unordered(solve_plan, tasks):
+            if group_to_students is not None:
+                print(f"Plan {describe_plan(plan)} is feasible.")
+                pool.terminate()
+                return group_to_students
+            print(f"Plan {describe_plan(plan)} is infeasible (or timed out).")
+    return None
+
+
+def describe_plan(plan):
+    return ", ".join(f"{count} of size {size}" for size, count in sorted(plan.items()) if count)
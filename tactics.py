@@ -0,0 +1,87 @@
+import json
+import math
+import os
+
+from z3 import *
+
+# Z3 tactic chains for the group models.
+#
+# A plain Solver() runs Z3's general SMT pipeline, although the models are
+#   pure boolean/pseudo-boolean. tactics.json names alternative chains; each
+#   step is a tactic name or [name, {parameters}], e.g.
+#       ["simplify", "propagate-values", "solve-eqs", "pb2bv", "bit-blast", ["sat", {"max_conflicts": 100000}]]
+#   "default" always means the plain Solver().
+#
+# `groups.py --tune-tactics DIR` times every chain on the instances under DIR
+#   and records the fastest per instance family (group size and roster size,
+#   to the next power of two) under "winners"; --tactic auto, the default,
+#   then picks the recorded winner for the instance at hand.
+#
+# Chains other than "default" can't produce proofs, and their unsat cores are
+#   empty, so unsat results are less informative with them.
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tactics.json")
+
+
+def load_config(path=CONFIG_PATH):
+    if not os.path.exists(path):
+        return {"chains": {}, "winners": {}}
+    with open(path, mode="r") as f:
+        config = json.load(f)
+    config.setdefault("chains", {})
+    config.setdefault("winners", {})
+    return config
+
+
+def save_config(config, path=CONFIG_PATH):
+    with open(path, mode="w") as f:
+        json.dump(config, f, indent=2)
+        f.write("\n")
+
+
+# Names of every chain, including "default".
+def chain_names(config=None):
+    config = config or load_config()
+    return ["default"] + sorted(config["chains"])
+
+
+# Instance family used to look up tuned chains.
+def family(n_students, group_max):
+    return f"max{group_max}-{2 ** max(6, math.ceil(math.log2(max(n_students, 1))))}"
+
+
+# Resolves "auto" to the tuned chain for the family (or "default").
+def resolve(name, n_students, group_max, config=None):
+    config = config or load_config()
+    if name != "auto":
+        if name != "default" and name not in config["chains"]:
+            raise Exception(
+                f"ERROR: Unknown tactic chain {name} (expected one of {chain_names(config)})"
+            )
+        return name
+    winner = config["winners"].get(family(n_students, group_max), "default")
+    if winner != "default" and winner not in config["chains"]:
+        print(f"WARNING: Tuned tactic chain {winner} is not in {CONFIG_PATH}. Using default.")
+        return "default"
+    return winner
+
+
+def make_tactic(steps):
+    tactics = []
+    for step in steps:
+        if isinstance(step, str):
+            tactics.append(Tactic(step))
+        else:
+            name, params = step
+            tactics.append(With(name, **params))
+    return tactics[0] if len(tactics) == 1 else Then(*tactics)
+
+
+# A solver running the named chain. Only the default solver can produce
+#   proofs, so `proof` is ignored (and proofs switched off) for the rest.
+def make_solver(name, proof=False, config=None):
+    if name == "default":
+        set_param(proof=proof)
+        return Solver()
+    config = config or load_config()
+    set_param(proof=False)
+    return make_tactic(config["chains"][name]).solver()
@@ -1,12 +1,19 @@
 import csv
 from lib2to3.pgen2 import grammar
 import sys
+import argparse
 import random
 from pprint import pprint
 from collections import defaultdict
 
 from z3 import *
 
+import selection
+import size_plans
+import tactics
+from cardinality import ENCODINGS, Counter
+from reconcile import load_corrections
+
 # There are quite a few SMT solvers you might use; here's the start of
 # an approach using Z3. But note the SO post below: Z3 may not give you
 # a "best so far" result if it times out before returning an optimal solution.
@@ -47,18 +54,73 @@ GROUP_SIZES = {0, 4, 5, 6}
 GROUP_DEFAULT = 5
 
 # Input CSVs are supplied as command line arguments.
-if len(sys.argv) != 6:
-    print(
-        "Usage: groups.py <student_roster.csv> <blocklist.csv> <ta_slots.csv> "
-        "<individual_preferences.csv> <group_preferences.csv>"
+parser = argparse.ArgumentParser(
+    usage="term_project.py <student_roster.csv> <blocklist.csv> <ta_slots.csv> "
+    "<individual_preferences.csv> <group_preferences.csv> [options]"
+)
+parser.add_argument("all_students_path")
+parser.add_argument("blocklist_path")
+parser.add_argument("ta_slots_path")
+parser.add_argument("individual_prefs_path")
+parser.add_argument("group_prefs_path")
+parser.add_argument(
+    "--engine",
+    choices=["z3", "plans"],
+    default="z3",
+    help="plans: enumerate how many groups of each size to form up front and "
+    "solve each plan in its own worker",
+)
+parser.add_argument(
+    "--workers", type=int, help="worker processes for --engine plans (default: one per plan)"
+)
+parser.add_argument(
+    "--max-plans", type=int, default=8, help="number of best-ranked plans to try"
+)
+parser.add_argument(
+    "--encoding",
+    choices=ENCODINGS,
+    default="pb",
+    help="cardinality encoding for group sizes (see cardinality.py)",
+)
+parser.add_argument("--timeout", type=float, help="solver timeout in seconds")
+parser.add_argument(
+    "--tactic",
+    choices=tactics.chain_names(),
+    default="default",
+    help="Z3 tactic chain from tactics.json (see tactics.py; groups.py --tune-tactics "
+    "only times groups.py's model, so none is picked automatically here)",
+)
+parser.add_argument(
+    "--corrections",
+    metavar="PATH",
+    help="reconcile form and blocklist logins against the roster, writing suggested "
+    "corrections to PATH; if PATH already exists, parse the inputs with its corrections "
+    "(see reconcile.py)",
+)
+args = parser.parse_args()
+
+all_students_path = args.all_students_path
+blocklist_path = args.blocklist_path
+ta_slots_path = args.ta_slots_path
+individual_prefs_path = args.individual_prefs_path
+group_prefs_path = args.group_prefs_path
+
+# Maps mistyped logins to roster logins (see reconcile.py).
+corrections = {}
+if args.corrections:
+    corrections = load_corrections(
+        args.corrections,
+        all_students_path,
+        [individual_prefs_path],
+        [group_prefs_path],
+        blocklist_path,
     )
-    sys.exit(1)
 
-all_students_path = sys.argv[1]
-blocklist_path = sys.argv[2]
-ta_slots_path = sys.argv[3]
-individual_prefs_path = sys.argv[4]
-group_prefs_path = sys.argv[5]
+
+def login_in(value):
+    login = value.lower().strip()
+    return corrections.get(login, login)
+
 
 # Maps each student id to a set of meeting time preferences.
 student_availability = {}
@@ -83,7 +145,7 @@ with open(individual_prefs_path, mode="r") as individual_prefs_csv:
     individual_prefs_reader = csv.DictReader(individual_prefs_csv)
     for row in individual_prefs_reader:
         # Parse CS login and availabilities from CSV.
-        cs_login = row["Partner 1 - CS Login"].lower().strip()
+        cs_login = login_in(row["Partner 1 - CS Login"])
         prefs = row[
             "Check all mentor meeting slots for which you will be available each week of the Term Project"
         ].split(", ")
@@ -99,7 +161,7 @@ with open(individual_prefs_path, mode="r") as individual_prefs_csv:
         if cs_login in student_availability:
             student_availability[cs_login].update(prefs)
 
-            partner = row["Partner 2 - CS Login [optional]"].lower().strip()
+            partner = login_in(row["Partner 2 - CS Login [optional]"])
             if partner:
                 student_to_partners[cs_login] = {partner}
                 login_to_github_discord[partner] = {
@@ -119,7 +181,7 @@ with open(group_prefs_path, mode="r") as group_prefs_csv:
         # Parse CSV for CS logins of all group members.
         cs_logins = set()
         for i in range(1, max(GROUP_SIZES) + 1):
-            cs_login = row[f"Partner {i} - CS Login"].lower().strip()
+            cs_login = login_in(row[f"Partner {i} - CS Login"])
             if cs_login:
                 cs_logins.add(cs_login)
 
@@ -163,6 +225,14 @@ for student in student_availability:
         )
         student_availability[student] = set(time_slots)
 
+# Partners that aren't on the roster can't be placed, so every engine ignores them.
+for student, partners in list(student_to_partners.items()):
+    for p in sorted(partners - set(student_availability)):
+        print(f"WARNING: Partner {p} of student {student} was not found in course roster. Ignoring partner preference.")
+    student_to_partners[student] = partners & set(student_availability)
+    if not student_to_partners[student]:
+        del student_to_partners[student]
+
 
 # Gather TA to time slot mapping from TA time slot CSV.
 slot_to_tas = {}
@@ -183,7 +253,7 @@ with open(blocklist_path, mode="r") as blocklist_csv:
     blocklist_reader = csv.DictReader(blocklist_csv)
     for row in blocklist_reader:
         ta_login = row["TA CS Login"].lower().strip()
-        student_login = row["Student CS Login"].lower().strip()
+        student_login = login_in(row["Student CS Login"])
 
         if ta_login in ta_to_blocklist:
             ta_to_blocklist[ta_login].add(student_login)
@@ -192,6 +262,7 @@ with open(blocklist_path, mode="r") as blocklist_csv:
 
 # Convert student availabilities to accommodate for multiple TAs on a single slot.
 ta_time_slots = set()
+n_blocked = 0
 for student in student_availability:
     new_availabilities = set()
     for slot in student_availability[student]:
@@ -201,6 +272,8 @@ for student in student_availability:
                 if ta not in ta_to_blocklist or student not in ta_to_blocklist[ta]:
                     # Only add slot for student if TA has not blocklisted the student.
                     new_availabilities.add(new_slot)
+                else:
+                    n_blocked += 1
                 ta_time_slots.add(new_slot)
         else:
             print(
@@ -226,118 +299,141 @@ N_STUDENTS = len(student_id_map)
 #         "WARNING: Number of students not divisible by group size. Some groups must be larger than others."
 #     )
 
-# If not using soft constraints, just use Solver()
-# solver = Optimize()
-set_param(proof=True)
-solver = Solver()
-solver.set(unsat_core=True)  # must enable core extraction
-solver.set(":core.minimize", True)  # not sure how good this is
-
-# Boolean variables; assignment[s][g] is true IFF s is assigned to g
-# Some unused variables, but these shouldn't appear in constraints
-assignment = {
-    s: {g: z3.Bool(f"assignment_{s}_{g}") for g in ta_time_slot_id_map}
-    for s in student_id_map
-}
-
-# everybody gets a group
-# nobody gets >1 group
-for s in student_id_map:
-    # Limiting by availability /pre/-solver reduces the problem complexity
-    login = student_id_map[s]
-    potential_s_assignments = [
-        assignment[s][slot_to_id[g]] for g in student_availability[login]
-    ]
-    solver.assert_and_track(Or(potential_s_assignments), f"{login}_is_assigned")
-
-    # non availability
-    impossible_s_assignments = [
-        assignment[s][g]
-        for g in ta_time_slot_id_map
-        if ta_time_slot_id_map[g] not in student_availability[login]
-    ]
-    for a in impossible_s_assignments:
-        solver.assert_and_track(Not(a), f"{login}_is_not_assigned_to_{a}")
-
-    for a in potential_s_assignments:
-        # Hack: "a2 != a" produces an error; Z3 tries to protect us from using references to
-        #   boolean variables in the *solver* as if they were booleans in the program.
-        #   100% sure there is a better way than comparing the string rep of each...
-        solver.assert_and_track(
-            Implies(
-                a, Not(Or([a2 for a2 in potential_s_assignments if str(a2) != str(a)]))
-            ),
-            f"{login}_assignment_to_{a}_is_unique",
-        )
-
-# no group is too big
-# cardinality is expensive; Z3 has a built-in pseudo-boolean engine;
-# TODO
-for g in ta_time_slot_id_map:
-    assigned_to_g = [assignment[s][g] for s in student_id_map]
-    solver.assert_and_track(
-        Or(
-            [PbEq([(x, 1) for x in assigned_to_g], size) for size in GROUP_SIZES],
-        ),
-        f"{ta_time_slot_id_map[g]}_size_is_{max(GROUP_SIZES)}_or_0",
-    )
-
-# if student has partners, make sure they are all assigned to the same group
-seen = set()
-for s in student_id_map:
-    cs_login = student_id_map[s]
-    if cs_login in student_to_partners:
-        for g in ta_time_slot_id_map:
+# Builds the full Z3 model and solves it.
+# Returns a map from TA slot to the students assigned to it, or None if unsat.
+def solve_with_z3():
+    # If not using soft constraints, just use Solver()
+    # solver = Optimize()
+    solver = tactics.make_solver(chain, proof=True)
+    solver.set(unsat_core=True)  # must enable core extraction
+    solver.set(":core.minimize", True)  # not sure how good this is
+    if args.timeout is not None:
+        solver.set(timeout=int(args.timeout * 1000))
+
+    # Boolean variables; assignment[s][g] is true IFF s is assigned to g
+    # Some unused variables, but these shouldn't appear in constraints
+    assignment = {
+        s: {g: z3.Bool(f"assignment_{s}_{g}") for g in ta_time_slot_id_map}
+        for s in student_id_map
+    }
+
+    # everybody gets a group
+    # nobody gets >1 group
+    for s in student_id_map:
+        # Limiting by availability /pre/-solver reduces the problem complexity
+        login = student_id_map[s]
+        potential_s_assignments = [
+            assignment[s][slot_to_id[g]] for g in student_availability[login]
+        ]
+        solver.assert_and_track(Or(potential_s_assignments), f"{login}_is_assigned")
+
+        # non availability
+        impossible_s_assignments = [
+            assignment[s][g]
+            for g in ta_time_slot_id_map
+            if ta_time_slot_id_map[g] not in student_availability[login]
+        ]
+        for a in impossible_s_assignments:
+            solver.assert_and_track(Not(a), f"{login}_is_not_assigned_to_{a}")
+
+        for a in potential_s_assignments:
+            # Hack: "a2 != a" produces an error; Z3 tries to protect us from using references to
+            #   boolean variables in the *solver* as if they were booleans in the program.
+            #   100% sure there is a better way than comparing the string rep of each...
             solver.assert_and_track(
                 Implies(
-                    assignment[s][g],
-                    And(
-                        [
-                            assignment[student_to_id[p]][g]
-                            for p in student_to_partners[cs_login]
-                        ]
-                    ),
+                    a, Not(Or([a2 for a2 in potential_s_assignments if str(a2) != str(a)]))
                 ),
-                f"{cs_login}_partners_all_in_or_out_of_{g}",
+                f"{login}_assignment_to_{a}_is_unique",
             )
 
-        # if the number of partners is a valid group size, no new partners are assigned to the group
-        if len(student_to_partners[cs_login]) + 1 in GROUP_SIZES:
-            for p in student_id_map:
-                if (
-                    p != s
-                    and student_id_map[p] not in student_to_partners[cs_login]
-                    and cs_login not in seen
-                ):
-                    solver.assert_and_track(
-                        Implies(
-                            assignment[s][g],
-                            Not(assignment[p][g]),
+    # no group is too big
+    # cardinality is expensive; Z3 has a built-in pseudo-boolean engine, and
+    #   cardinality.py has the alternative encodings. Students who aren't
+    #   available for g are already ruled out, so only candidates are counted.
+    candidates = {g: [] for g in ta_time_slot_id_map}
+    for s in student_id_map:
+        for slot in student_availability[student_id_map[s]]:
+            candidates[slot_to_id[slot]].append(s)
+    slot_counters = {}
+    for g in ta_time_slot_id_map:
+        assigned_to_g = [assignment[s][g] for s in candidates[g]]
+        slot_counters[g] = Counter(
+            assigned_to_g, max(GROUP_SIZES) + 1, args.encoding, f"count_{g}"
+        )
+        solver.add(slot_counters[g].constraints)
+        solver.assert_and_track(
+            slot_counters[g].in_sizes(GROUP_SIZES),
+            f"{ta_time_slot_id_map[g]}_size_is_{max(GROUP_SIZES)}_or_0",
+        )
+
+    # if student has partners, make sure they are all assigned to the same group
+    seen = set()
+    for s in student_id_map:
+        cs_login = student_id_map[s]
+        if cs_login in student_to_partners:
+            for g in ta_time_slot_id_map:
+                solver.assert_and_track(
+                    Implies(
+                        assignment[s][g],
+                        And(
+                            [
+                                assignment[student_to_id[p]][g]
+                                for p in student_to_partners[cs_login]
+                            ]
                         ),
-                        f"{student_id_map[p]}_not_assigned_to_{g}_cause_full_group_{s}",
-                    )
-                    seen.update(student_to_partners[cs_login] | {cs_login})
-    else:
-        # if no partners, the student is assigned to a default sized group
-        for g in ta_time_slot_id_map:
-            assigned_to_g = [assignment[stu][g] for stu in student_id_map]
-            solver.assert_and_track(
-                Implies(
-                    assignment[s][g],
-                    PbEq([(x, 1) for x in assigned_to_g], GROUP_DEFAULT),
-                ),
-                f"{s}_{g}_default_group_size",
-            )
+                    ),
+                    f"{cs_login}_partners_all_in_or_out_of_{g}",
+                )
+
+            # if the number of partners is a valid group size, no new partners are assigned to the group
+            if len(student_to_partners[cs_login]) + 1 in GROUP_SIZES:
+                for p in student_id_map:
+                    if (
+                        p != s
+                        and student_id_map[p] not in student_to_partners[cs_login]
+                        and cs_login not in seen
+                    ):
+                        solver.assert_and_track(
+                            Implies(
+                                assignment[s][g],
+                                Not(assignment[p][g]),
+                            ),
+                            f"{student_id_map[p]}_not_assigned_to_{g}_cause_full_group_{s}",
+                        )
+                        seen.update(student_to_partners[cs_login] | {cs_login})
+        else:
+            # if no partners, the student is assigned to a default sized group
+            for g in ta_time_slot_id_map:
+                solver.assert_and_track(
+                    Implies(
+                        assignment[s][g],
+                        slot_counters[g].equals(GROUP_DEFAULT),
+                    ),
+                    f"{s}_{g}_default_group_size",
+                )
 
 
-# Uncomment this to view the (verbose) set of solver constraints
-# print(solver)
+    # Uncomment this to view the (verbose) set of solver constraints
+    # print(solver)
+
+    result = solver.check()
+    if result == unsat:
+        print("unsat")
+        if chain != "default":
+            print(f"(no unsat core or proof with tactic chain {chain})")
+            return None
+        print(solver.unsat_core())
+        try:
+            print(solver.proof())
+        except Z3Exception:
+            # Z3's pseudo-boolean solver doesn't record proofs
+            print("(no proof recorded)")
+        return None
+    if result == unknown:
+        print(f"unknown: {solver.reason_unknown()}")
+        return None
 
-if solver.check() == unsat:
-    print("unsat")
-    print(solver.unsat_core())
-    print(solver.proof())
-else:
     # Note this won't include values for un-used variables
     # trying to evaluate an unused variable may produce a confusing error.
     #   We could tell "eval" to enable model completion, but that would just give
@@ -358,7 +454,39 @@ else:
             group_to_students[ta_time_slot_id_map[gs[0]]].append(student_id_map[s])
         else:
             group_to_students[ta_time_slot_id_map[gs[0]]] = [student_id_map[s]]
+    return group_to_students
+
+
+# The instance profile is logged on every run (see selection.py).
+profile = selection.profile(
+    student_availability,
+    student_to_partners,
+    {slot: max(GROUP_SIZES) for slot in ta_time_slots},
+    "sizes" + ",".join(str(size) for size in sorted(GROUP_SIZES) if size > 0),
+    n_blocked,
+)
+print(f"Instance profile: {selection.describe(profile)}")
+print(f"Engine: {args.engine} (--engine)")
+
+chain = tactics.resolve(args.tactic, len(student_availability), max(GROUP_SIZES))
+
+if args.engine == "plans":
+    group_to_students = size_plans.solve(
+        student_availability,
+        student_to_partners,
+        ta_time_slots,
+        GROUP_SIZES,
+        GROUP_DEFAULT,
+        workers=args.workers,
+        max_plans=args.max_plans,
+        timeout=args.timeout,
+        encoding=args.encoding,
+        chain=chain,
+    )
+else:
+    group_to_students = solve_with_z3()
 
+if group_to_students is not None:
     for g in sorted(slot_to_id, key=lambda g: g.split("(")[1]):
         if g not in group_to_students:
             group_to_students[g] = []
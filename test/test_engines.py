@@ -0,0 +1,127 @@
+import itertools
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import benchmark
+import exact_cover
+from cardinality import ENCODINGS
+from engines import ENGINES, extract_groups
+from instance import Instance, find_inputs, load_instance
+from preprocess import preprocess
+
+
+def check_solution(instance, assigned):
+    group_to_students = extract_groups(instance, assigned)
+    return check_groups(instance, group_to_students)
+
+
+def check_groups(instance, group_to_students):
+    assert sorted(l for logins in group_to_students.values() for l in logins) == sorted(
+        instance.student_availability
+    )
+    for slot, logins in group_to_students.items():
+        assert len(logins) <= instance.slot_capacity[slot]
+        for login in logins:
+            assert slot in instance.student_availability[login]
+            for p in instance.student_to_partners.get(login, ()):
+                assert p in logins
+
+
+# data/big has partners that aren't on the roster; every engine has to cope
+#   with the instance as loaded, without preprocessing. It has far more
+#   candidate groups than exact cover takes, so exact can only fall back to z3.
+def test_big_without_preprocessing():
+    instance = load_instance(group_max=3, **find_inputs(os.path.join(ROOT, "data", "big")))
+    assert exact_cover.solve(instance) == ("skipped", None)
+    for name in ["z3", "sat", "exact"]:
+        assigned = ENGINES[name]().solve(instance, timeout=120)
+        assert assigned is not None, name
+        check_solution(instance, assigned)
+
+
+# A medium instance under the row limit, so Algorithm X itself runs.
+def test_exact_cover_below_row_limit():
+    instance = benchmark.random_instance(120, 3, slack=1.2, avail_per_student=4)
+    result, assignment = exact_cover.solve(instance)
+    assert result == "sat"
+    assigned = ENGINES["exact"]().solve(instance, timeout=120)
+    check_solution(instance, assigned)
+    group_to_students = extract_groups(instance, assigned)
+    assert all(len(logins) == 3 for logins in group_to_students.values())
+    assert len(assignment) == 120
+
+
+# A few students and TA slots with random availability and partner pairs.
+def tiny_instance(rng):
+    slots = [f"slot{g} (ta{g % 2})" for g in range(rng.randint(1, 4))]
+    students = [f"student{s}" for s in range(rng.randint(1, 7))]
+    availability = {s: {g for g in slots if rng.random() < 0.6} for s in students}
+    partners = {}
+    for a, b in zip(students[::2], students[1::2]):
+        if rng.random() < 0.3:
+            partners[a], partners[b] = {b}, {a}
+    return Instance(availability, partners, slots, 3)
+
+
+# Every assignment, tried one by one: (a solution exists, one with every
+#   non-empty group full exists).
+def brute_force(instance):
+    students = sorted(instance.student_availability)
+    feasible = full = False
+    for slots in itertools.product(*(sorted(instance.student_availability[s]) for s in students)):
+        chosen = dict(zip(students, slots))
+        sizes = {g: slots.count(g) for g in set(slots)}
+        if any(sizes[g] > instance.slot_capacity[g] for g in sizes):
+            continue
+        if any(chosen[p] != chosen[s] for s in students for p in instance.student_to_partners.get(s, ())):
+            continue
+        feasible = True
+        full = full or all(sizes[g] == instance.group_max for g in sizes)
+    return feasible, full
+
+
+# Each engine, on the instance itself and on what preprocessing leaves of it,
+#   against brute force on random tiny instances. exact only accepts full
+#   groups, so it's compared with that; lns always spends its whole budget
+#   improving groups, so it's left out.
+def test_engines_agree_with_brute_force():
+    engines = [ENGINES["z3"](encoding=encoding) for encoding in ENCODINGS]
+    engines += [ENGINES["sat"](encoding=encoding) for encoding in ENCODINGS[1:]]
+    engines += [ENGINES["decompose"](), ENGINES["exact"]()]
+    rng = random.Random(0)
+    for seed in range(60):
+        instance = tiny_instance(rng)
+        feasible, full = brute_force(instance)
+        preprocessed = preprocess(instance)
+        assert preprocessed is not None or not feasible, seed
+        for engine in engines:
+            expected = full if engine.name == "exact" else feasible
+
+            assigned = engine.solve(instance)
+            assert (assigned is not None) == expected, (seed, engine.label)
+            if assigned is not None:
+                check_solution(instance, assigned)
+
+            if preprocessed is None:
+                continue
+            residual, fixed = preprocessed
+            assigned = engine.solve(residual)
+            assert (assigned is not None) == expected, (seed, engine.label, "preprocessed")
+            if assigned is not None:
+                group_to_students = extract_groups(residual, assigned)
+                for login, slot in fixed.items():
+                    group_to_students.setdefault(slot, []).append(login)
+                check_groups(instance, group_to_students)
+
+
+# Asking for more students to move than there are ends the enumeration after
+#   the first solution instead of failing.
+def test_enumerate_past_roster_size():
+    instance = load_instance(group_max=3, **find_inputs(os.path.join(ROOT, "data", "small")))
+    for name in ["z3", "sat"]:
+        solutions = list(ENGINES[name]().enumerate(instance, 3, len(instance.student_availability) + 1))
+        assert len(solutions) == 1, name
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SMALL = os.path.join(ROOT, "data", "small")
+CSVS = [
+    os.path.join(SMALL, name)
+    for name in [
+        "Student Roster.csv",
+        "TA blocklist.csv",
+        "TA time slots.csv",
+        "Form B Response.csv",
+        "Form A Response.csv",
+    ]
+]
+
+# Runs groups.py as __main__ with worker processes spawned rather than forked
+#   (the default on macOS and Windows), so every worker re-imports groups.py.
+SPAWN = (
+    "import multiprocessing, os, runpy, sys; multiprocessing.set_start_method('spawn'); "
+    "sys.argv = sys.argv[1:]; sys.path.insert(0, os.path.dirname(sys.argv[0])); "
+    "runpy.run_path(sys.argv[0], run_name='__main__')"
+)
+
+
+# Runs in `directory`, since groups.py writes its solutions to the working directory.
+def run_spawned(directory, *flags, timeout=120):
+    return subprocess.run(
+        [sys.executable, "-c", SPAWN, os.path.join(ROOT, "groups.py"), *CSVS, *flags],
+        cwd=directory,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+
+
+def test_criticality_under_spawn(tmp_path):
+    result = run_spawned(tmp_path, "--criticality", "--workers", "2")
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "slots are critical" in result.stdout
+
+
+def test_lns_under_spawn(tmp_path):
+    result = run_spawned(tmp_path, "--engine", "lns", "--timeout", "5", "--workers", "2")
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "LNS: finished" in result.stdout
@@ -0,0 +1,99 @@
+import csv
+import os
+import random
+import string
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reconcile import AUTO_DISTANCE, LoginIndex, edit_distance, load_corrections
+
+ROSTER = ["abrown", "cdavis7", "cdavis8", "emiller", "fgarcia", "hlee", "jwilson"]
+
+
+def write_csv(path, header, rows):
+    with open(path, mode="w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_edit_distance():
+    assert edit_distance("kitten", "sitting", 5) == 3
+    assert edit_distance("hlee", "hlee", 2) == 0
+    # past the bound it gives up with bound + 1
+    assert edit_distance("abrown", "jwilson", 2) == 3
+    assert edit_distance("hlee", "hleeabc", 2) == 3
+
+
+def test_suggest():
+    index = LoginIndex(ROSTER)
+    assert index.suggest("emiller") == [("emiller", 0)]
+    assert index.suggest("emiller@brown.edu") == [("emiller", 0)]
+    assert index.suggest("fgarci")[0] == ("fgarcia", 1)
+    # equally close to both, so neither should be picked on its own
+    assert [d for _, d in index.suggest("cdavis9")[:2]] == [1, 1]
+
+
+# One form row per case: a mistyped own login, an email address, a truncated
+#   login, a tie, one too far to correct and an unconfirmed partner; plus a
+#   mistyped login in the blocklist.
+def test_load_corrections(tmp_path):
+    roster = write_csv(tmp_path / "roster.csv", ["Student CS Login"], [[login] for login in ROSTER])
+    form = write_csv(
+        tmp_path / "form.csv",
+        ["Your CS Login", "(optional) Partner CS Login"],
+        [
+            ["abrwon", "emiller"],
+            ["emiller@brown.edu", "fgarcia"],
+            ["fgarci", "emiller"],
+            ["cdavis9", ""],
+            ["jwilsonxyz", ""],
+            ["hlee", "jwilson"],
+        ],
+    )
+    blocklist = write_csv(tmp_path / "blocklist.csv", ["TA CS Login", "Student CS Login"], [["ta", "hle"]])
+    path = str(tmp_path / "corrections.csv")
+
+    corrections = load_corrections(path, roster, [form], [], blocklist)
+    assert corrections == {
+        "abrwon": "abrown",
+        "emiller@brown.edu": "emiller",
+        "fgarci": "fgarcia",
+        "hle": "hlee",
+    }
+    with open(path) as f:
+        notes = {(row["Login"], row["Note"]) for row in csv.DictReader(f)}
+    assert ("cdavis9", "ambiguous, pick one of the suggestions") in notes
+    assert edit_distance("jwilsonxyz", "jwilson", 5) > AUTO_DISTANCE
+    assert ("jwilsonxyz", "too far from any roster login") in notes
+    assert ("abrown", "asymmetric partner claim: abrown names emiller, but emiller names fgarcia") in notes
+    assert ("hlee", "unconfirmed partner claim: hlee names jwilson, who filled out no form") in notes
+    # emiller and fgarcia name each other once corrected
+    assert not any(login in ["emiller", "fgarcia"] for login, _ in notes)
+
+    # an existing (reviewed) file is used as-is
+    assert load_corrections(path, roster, [form], [], blocklist) == corrections
+
+
+# 1,000 lookups against 10,000 logins take about 0.8s; the bound leaves room
+#   for slow machines but not for a scan of the whole roster per lookup.
+def test_suggest_speed():
+    rng = random.Random(0)
+    logins = set()
+    while len(logins) < 10_000:
+        name = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 9)))
+        logins.add(f"{name}{rng.randint(0, 99)}")
+    index = LoginIndex(logins)
+    queries = []
+    for login in rng.sample(sorted(logins), 1000):
+        i = rng.randrange(len(login))
+        queries.append((login, login[:i] + login[i + 1 :]))
+
+    start = time.perf_counter()
+    suggestions = [index.suggest(typo) for _, typo in queries]
+    assert time.perf_counter() - start < 5
+    assert all(found[0] == (login, 1) for (login, _), found in zip(queries, suggestions))
@@ -0,0 +1,292 @@
+import multiprocessing
+import re
+import time
+
+from z3 import *
+
+# What-if queries against one warm solver.
+#
+# Every TA slot, blocklist row and partner link is guarded by an activation
+#   literal, so "what if this slot/TA/row/link were gone" is a solver.check()
+#   under assumptions instead of an edited CSV and a fresh run. Blocklisted
+#   (student, slot) pairs get variables too, which lets a query lift a row.
+#
+# A query is a ";"-separated list of changes:
+#   remove-slot=<TA slot>        the slot is not offered
+#   remove-ta=<TA login>         none of the TA's slots are offered
+#   drop-block=<TA>/<student>    the blocklist row is lifted
+#   drop-partner=<login>/<login> the partner link is dropped
+#   move=<student>/<text>        the student must get a slot containing <text>
+#                                (e.g. "Thurs", or a whole slot name)
+#   Slot names never contain ";" (see instance.split_slots), so it's safe as a
+#   separator.
+CHANGES = ["remove-slot", "remove-ta", "drop-block", "drop-partner", "move"]
+# Z3's timeout for "no limit", in milliseconds.
+NO_TIMEOUT = 4294967295
+
+
+# The TA login at the end of a "{slot} ({ta})" TA slot.
+def slot_ta(slot):
+    match = re.search(r"\(([^()]*)\)$", slot)
+    return match.group(1) if match else None
+
+
+class WhatIf:
+    def __init__(self, instance):
+        self.instance = instance
+        self.solver = Solver()
+        self.solver.set(":core.minimize", True)
+        # maps each activation literal (by name) to a description, for unsat cores
+        self.descriptions = {}
+        self.moves = {}
+        self.baseline = None
+
+        self.slot_on = {slot: self._activation(f"slot {slot}") for slot in instance.slot_capacity}
+        self.block_on = {
+            (ta, login): self._activation(f"blocklist row {ta}/{login}")
+            for (login, _), ta in instance.blocked.items()
+        }
+        self.link_on = {}
+        for login, partners in instance.student_to_partners.items():
+            for p in partners:
+                if login in instance.student_to_id and p in instance.student_to_id:
+                    link = tuple(sorted([login, p]))
+                    if link not in self.link_on:
+                        self.link_on[link] = self._activation(f"partner link {link[0]}/{link[1]}")
+
+        # Boolean variables; x[(login, slot)] is true IFF login is assigned to slot.
+        #   Blocklisted pairs are included; their row's literal rules them out.
+        self.x = {}
+        for login, slots in instance.student_availability.items():
+            for slot in slots:
+                self.x[(login, slot)] = Bool(f"x_{login}_{slot}")
+        for (login, slot), ta in instance.blocked.items():
+            if login in instance.student_availability:
+                x = Bool(f"x_{login}_{slot}")
+                self.x[(login, slot)] = x
+                self.solver.add(Implies(x, Not(self.block_on[(ta, login)])))
+
+        slot_to_students = {slot: [] for slot in instance.slot_capacity}
+        student_to_slots = {login: [] for login in instance.student_availability}
+        for login, slot in self.x:
+            slot_to_students[slot].append(login)
+            student_to_slots[login].append(slot)
+
+        # everybody gets exactly one group
+        for login, slots in student_to_slots.items():
+            self.solver.add(PbEq([(self.x[(login, slot)], 1) for slot in slots], 1))
+
+        # no group is too big, and nobody goes to a slot that isn't offered
+        for slot, students in slot_to_students.items():
+            for login in students:
+                self.solver.add(Implies(self.x[(login, slot)], self.slot_on[slot]))
+            capacity = instance.slot_capacity[slot]
+            if len(students) > capacity:
+                self.solver.add(PbLe([(self.x[(login, slot)], 1) for login in students], capacity))
+
+        # linked partners are in the same group
+        for (a, b), on in self.link_on.items():
+            for p, q in [(a, b), (b, a)]:
+                for slot in student_to_slots[p]:
+                    self.solver.add(
+                        Implies(And(on, self.x[(p, slot)]), self.x.get((q, slot), False))
+                    )
+
+    def _activation(self, description):
+        literal = Bool(f"on_{len(self.descriptions)}")
+        self.descriptions[str(literal)] = description
+        return literal
+
+    # Parses a query into a list of (change, arguments) pairs.
+    def parse(self, query):
+        changes = []
+        for text in query.split(";"):
+            text = text.strip()
+            if not text:
+                continue
+            change, _, value = text.partition("=")
+            change, value = change.strip(), value.strip()
+            if change not in CHANGES:
+                raise Exception(f"ERROR: Unknown change {change} (expected one of {CHANGES})")
+            if change == "remove-slot":
+                if value not in self.slot_on:
+                    raise Exception(f"ERROR: Unknown TA slot {value}")
+                changes.append((change, (value,)))
+            elif change == "remove-ta":
+                if not any(slot_ta(slot) == value for slot in self.slot_on):
+                    raise Exception(f"ERROR: TA {value} has no slots")
+                changes.append((change, (value,)))
+            else:
+                first, _, second = value.partition("/")
+                first, second = first.strip().lower(), second.strip()
+                if change == "drop-block" and (first, second.lower()) not in self.block_on:
+                    raise Exception(f"ERROR: No blocklist row {first}/{second} affects any slot")
+                if change == "drop-partner" and tuple(sorted([first, second.lower()])) not in self.link_on:
+                    raise Exception(f"ERROR: {first} and {second} are not partners")
+                if change == "move" and first not in self.instance.student_availability:
+                    raise Exception(f"ERROR: Unknown student {first}")
+                changes.append((change, (first, second)))
+        return changes
+
+    # The assumptions that turn every constraint on, except for the changes.
+    def assumptions(self, changes):
+        off = set()
+        literals = []
+        for change, value in changes:
+            if change == "remove-slot":
+                off.add(str(self.slot_on[value[0]]))
+            elif change == "remove-ta":
+                off.update(str(on) for slot, on in self.slot_on.items() if slot_ta(slot) == value[0])
+            elif change == "drop-block":
+                off.add(str(self.block_on[(value[0], value[1].lower())]))
+            elif change == "drop-partner":
+                off.add(str(self.link_on[tuple(sorted([value[0], value[1].lower()]))]))
+            elif change == "move":
+                literals.append(self._move(*value))
+
+        for on in [*self.slot_on.values(), *self.block_on.values(), *self.link_on.values()]:
+            literals.append(Not(on) if str(on) in off else on)
+        return literals
+
+    # A literal that, when assumed, puts the student in a slot containing `text`.
+    #   Each one is added once and reused by later queries.
+    def _move(self, login, text):
+        if (login, text) not in self.moves:
+            literal = Bool(f"move_{len(self.moves)}")
+            self.descriptions[str(literal)] = f"move {login} to {text}"
+            matching = [
+                x for (s, slot), x in self.x.items() if s == login and text.lower() in slot.lower()
+            ]
+            self.solver.add(Implies(literal, Or(matching)))
+            self.moves[(login, text)] = literal
+        return self.moves[(login, text)]
+
+    # Answers one query. Returns (result, model or None, [descriptions of the
+    #   constraints that conflict, when the result is unsat]). Reading the whole
+    #   assignment out of the model costs far more than the check itself, so
+    #   that is left to assignment() and moved().
+    def check(self, changes=(), timeout=None):
+        # the solver keeps the last limit set, so every check sets its own
+        self.solver.set(timeout=NO_TIMEOUT if timeout is None else int(timeout * 1000))
+        result = self.solver.check(*self.assumptions(changes))
+        if result == unsat:
+            core = [self.descriptions[str(literal.children()[0] if is_not(literal) else literal)]
+                    for literal in self.solver.unsat_core()]
+            return "unsat", None, core
+        if result == unknown:
+            return "unknown", None, []
+        model = self.solver.model()
+        if self.baseline is None and not changes:
+            self.baseline = self.assignment(model)
+        return "sat", model, []
+
+    # The {login: TA slot} assignment of a model.
+    def assignment(self, model):
+        return {login: slot for (login, slot), x in self.x.items() if is_true(model.eval(x))}
+
+    # Number of students a model puts in a different slot than the baseline.
+    def moved(self, model):
+        if self.baseline is None:
+            return 0
+        return sum(
+            1
+            for login, slot in self.baseline.items()
+            if not is_true(model.eval(self.x[(login, slot)]))
+        )
+
+    # Answers a query in text form and prints the outcome. The empty query
+    #   checks the unchanged instance.
+    def ask(self, query, timeout=None):
+        label = query or "baseline"
+        start = time.perf_counter()
+        try:
+            changes = self.parse(query)
+        except Exception as e:
+            print(e)
+            return None
+        result, model, core = self.check(changes, timeout)
+        ms = (time.perf_counter() - start) * 1000
+        if result == "sat":
+            print(f"{label}: feasible, {self.moved(model)} students change slot ({ms:.1f} ms)")
+        elif result == "unsat":
+            print(f"{label}: infeasible ({ms:.1f} ms); conflicting constraints:")
+            for description in core:
+                print(f"  {description}")
+        else:
+            print(f"{label}: unknown ({ms:.1f} ms)")
+        return result
+
+
+# Time limit in seconds for each check while growing the removable set, unless
+#   a timeout is given.
+GREEDY_TIMEOUT = 1
+
+# Each criticality worker keeps one warm WhatIf of its own.
+_model = None
+
+
+def _start_worker(instance, timeout):
+    global _model
+    _model = WhatIf(instance)
+    _model.check((), timeout)
+
+
+def _without_slot(task):
+    slot, timeout = task
+    start = time.perf_counter()
+    result, _, _ = _model.check([("remove-slot", (slot,))], timeout)
+    return slot, result, (time.perf_counter() - start) * 1000
+
+
+# Reports, for every TA slot, whether the instance stays feasible without it
+#   (checked in parallel, one warm solver per worker), then greedily grows a set
+#   of slots that can all be removed together on the warm solver of `model`.
+def slot_criticality(model, workers=None, timeout=None):
+    slots = sorted(model.slot_on)
+    workers = workers or multiprocessing.cpu_count()
+    start = time.perf_counter()
+    with multiprocessing.Pool(
+        workers, initializer=_start_worker, initargs=(model.instance, timeout)
+    ) as pool:
+        outcomes = sorted(
+            pool.imap_unordered(
+                _without_slot,
+                [(slot, timeout) for slot in slots],
+                chunksize=max(1, len(slots) // (workers * 4)),
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    used = set(model.baseline.values()) if model.baseline else set()
+    print(f"Slot criticality ({len(slots)} slots, {workers} workers, {elapsed:.2f}s):")
+    for slot, result, ms in outcomes:
+        status = {"unsat": "CRITICAL", "sat": "spare", "unknown": "unknown"}[result]
+        note = "" if slot in used else " (unused in the baseline solution)"
+        print(f"  {slot:<45} {status:<9} {ms:8.1f} ms{note}")
+    critical = [slot for slot, result, _ in outcomes if result == "unsat"]
+    print(f"{len(critical)} of {len(slots)} slots are critical.")
+
+    # Spare slots aren't necessarily spare together; try dropping them one by
+    #   one, least used first, keeping each removal that stays feasible.
+    #   Near the point where the slots left can't seat everyone, proving
+    #   infeasibility is a pigeonhole argument that CDCL is slow at, so slots
+    #   that would leave too few seats are skipped by counting, and every check
+    #   gets a time limit (giving up counts as "not removable").
+    removable = []
+    seats = sum(model.instance.slot_capacity.values())
+    n_students = len(model.instance.student_availability)
+    spare = [slot for slot, result, _ in outcomes if result == "sat"]
+    spare.sort(key=lambda slot: slot in used)
+    for slot in spare:
+        if seats - model.instance.slot_capacity[slot] < n_students:
+            continue
+        changes = [("remove-slot", (s,)) for s in removable + [slot]]
+        if model.check(changes, timeout or GREEDY_TIMEOUT)[0] == "sat":
+            removable.append(slot)
+            seats -= model.instance.slot_capacity[slot]
+    print(
+        f"{len(slots) - len(removable)} slots are enough; these {len(removable)} can all be removed together:"
+    )
+    for slot in removable:
+        print(f"  {slot}")
+    return outcomes, removable